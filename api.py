@@ -0,0 +1,55 @@
+from datetime import date
+from functools import wraps
+
+from flask import jsonify, make_response, request
+
+API_PREFIX = '/api/v1'
+
+
+def wants_json():
+    """True when the request came in through the API prefix or prefers JSON over HTML."""
+    if request.path.startswith(API_PREFIX + '/'):
+        return True
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+
+def to_json(value):
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def select_fields(payload, fields):
+    """Keep only ``fields`` (a comma separated list) of the object or objects under ``payload['data']``.
+
+    Payloads without data, such as error bodies, are returned as they are.
+    """
+    if not fields or 'data' not in payload:
+        return payload
+    keep = {field.strip() for field in fields.split(',') if field.strip()}
+
+    def pick(item):
+        return {key: value for key, value in item.items() if key in keep}
+
+    data = payload['data']
+    return dict(payload, data=[pick(item) for item in data] if isinstance(data, list) else pick(data))
+
+
+def api_response(payload, status=200):
+    return jsonify(to_json(select_fields(payload, request.args.get('fields')))), status
+
+
+def negotiated(view):
+    """Mark a view that answers with HTML or JSON depending on the request, so caches key on Accept."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        response.vary.add('Accept')
+        return response
+
+    return wrapper
@@ -3,15 +3,20 @@
 # ----------------------------------------------------------------------------#
 
 import json
+import os
+import signal
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 from itertools import groupby
-from operator import attrgetter
+from operator import attrgetter, itemgetter
 from sys import stderr
 
+import click
 import dateutil.parser
-import babel
-import babel.dates
 import pytz
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from flask import (Flask, Blueprint, current_app, render_template, request, Response, flash, redirect, url_for,
+                   session, jsonify, abort, stream_with_context)
 from flask_migrate import Migrate
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
@@ -19,26 +24,164 @@ import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from sqlalchemy import func
-
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+
+from api import API_PREFIX, api_response, negotiated, wants_json
+from assets import AssetPipeline, build as build_assets
+from booking import DEFAULT_DURATION, MAX_DURATION, count_shows, free_slots, overlapping
+from cache import ResponseCache
+from compress import Compression
+from conditional import code_version, conditional, conditional_get, not_modified, validators, with_validators
+from database import RoutingSession, configure_engines, read_from_replica
+from filters import format_datetime
 from forms import *
+from fragments import FragmentCache
+from importer import IMPORT_FORMATS, IMPORTERS, read_rows
+from jobs import DONE, JobQueue
+from metrics import RequestMetrics, metrics_response
+from pagination import paginate_keyset
+from search import search_query
+from sqlguard import QueryGuard
+from templating import TemplateCache
+from typeahead import Typeahead
 
 # ----------------------------------------------------------------------------#
 # App Config.
 # ----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+moment = Moment()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+migrate = Migrate()
+page_cache = ResponseCache()
+fragment_cache = FragmentCache()
+request_metrics = RequestMetrics()
+compression = Compression()
+query_guard = QueryGuard()
+jobs = JobQueue(db)
+typeahead = Typeahead()
+template_cache = TemplateCache()
+assets = AssetPipeline()
+bp = Blueprint('main', __name__, cli_group=None)
+
+
+def create_app(config=None, pool_size=None, max_overflow=None, pool_recycle=None, statement_timeout=None,
+               replica_urls=None):
+    """Create the Fyyur application.
+
+    The keyword settings override the matching DB_* values of config.py, and ``config`` is a mapping
+    of any other settings to override (e.g. SQLALCHEMY_DATABASE_URI).
+    """
+    app = Flask(__name__)
+    app.config.from_object('config')
+    app.config.update(config or {})
+    for key, value in (('DB_POOL_SIZE', pool_size), ('DB_MAX_OVERFLOW', max_overflow),
+                       ('DB_POOL_RECYCLE', pool_recycle), ('DB_STATEMENT_TIMEOUT', statement_timeout),
+                       ('DB_REPLICA_URLS', replica_urls)):
+        if value is not None:
+            app.config[key] = value
+    replicas = configure_engines(app.config)
+
+    moment.init_app(app)
+    db.init_app(app)
+    migrate.init_app(app, db)
+    page_cache.init_app(app)
+    fragment_cache.init_app(app)
+    request_metrics.init_app(app)
+    # after RequestMetrics, so its after_request hook runs first and the metrics see the bytes sent
+    compression.init_app(app)
+    query_guard.init_app(app)
+    jobs.init_app(app)
+    typeahead.init_app(app)
+    assets.init_app(app)
+    app.extensions['db_replicas'] = replicas
+    app.extensions['code_version'] = code_version(app)
+    template_cache.init_app(app)
+    app.jinja_env.filters['datetime'] = format_datetime
+    app.register_blueprint(bp)
+
+    if not app.debug:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    # before the first request, so that it does not pay for loading the templates
+    if app.config['TEMPLATE_WARMUP']:
+        template_cache.warm_up(app)
+
+    return app
 
 
 # ----------------------------------------------------------------------------#
 # Models.
 # ----------------------------------------------------------------------------#
 
+class UTCDateTime(db.TypeDecorator):
+    """A timezone-aware timestamp that is always normalized to UTC when written."""
+    impl = db.DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = dateutil.parser.parse(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=pytz.UTC)
+        return value.astimezone(pytz.UTC)
+
+    def process_result_value(self, value, dialect):
+        # backends without native timezone support (e.g. SQLite) hand back naive values
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=pytz.UTC)
+        return value
+
+
+def utcnow():
+    return datetime.now(pytz.UTC)
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), unique=True, nullable=False)
+
+    @classmethod
+    def from_names(cls, names):
+        """Return the genres called ``names``, creating the ones that do not exist yet."""
+        names = list(dict.fromkeys(names))
+        existing = {genre.name: genre for genre in cls.query.filter(cls.name.in_(names))}
+        return [existing.get(name) or cls(name=name) for name in names]
+
+
+venue_genres = db.Table(
+    'VenueGenre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_VenueGenre_genre_id', 'genre_id'),
+)
+
+artist_genres = db.Table(
+    'ArtistGenre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_ArtistGenre_genre_id', 'genre_id'),
+)
+
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_state_city_id', 'state', 'city', 'id'),
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=True)
@@ -46,63 +189,130 @@ class Venue(db.Model):
     state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.String(120), nullable=False)
     website = db.Column(db.String(120), nullable=True)
-    seeking_talent = db.Column(db.Boolean, nullable=False)
+    seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String, nullable=True)
-    image_link = db.Column(db.String(500), nullable=False)
+    image_link = db.Column(db.String(500), nullable=False, default='')
     facebook_link = db.Column(db.String(120), nullable=False)
+    updated_at = db.Column(UTCDateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow,
+                           server_default=func.now())
+    # kept up to date by booking.count_shows and the roll_show_counts job
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
+    genres = db.relationship('Genre', secondary=venue_genres, order_by=Genre.name)
     shows = db.relationship('Show', backref='venue')
 
+    @property
+    def genre_names(self):
+        return [genre.name for genre in self.genres]
+
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=True, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.String(120), nullable=False)
     website = db.Column(db.String(120), nullable=True)
-    seeking_venue = db.Column(db.Boolean, nullable=False)
+    seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String, nullable=True)
-    image_link = db.Column(db.String(500), nullable=False)
+    image_link = db.Column(db.String(500), nullable=False, default='')
     facebook_link = db.Column(db.String(120), nullable=False)
+    updated_at = db.Column(UTCDateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow,
+                           server_default=func.now())
+    # kept up to date by booking.count_shows and the roll_show_counts job
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
+    genres = db.relationship('Genre', secondary=artist_genres, order_by=Genre.name)
     shows = db.relationship('Show', backref='artist')
 
+    @property
+    def genre_names(self):
+        return [genre.name for genre in self.genres]
+
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_venue_id_artist_id', 'start_time', 'venue_id', 'artist_id'),
+        db.Index('ix_Show_updated_at', 'updated_at'),
+        db.Index('ix_Show_uncounted_start_time', 'start_time',
+                 postgresql_where=db.text('NOT counted_past'), sqlite_where=db.text('NOT counted_past')),
+        db.CheckConstraint('end_time >= start_time', name='ck_Show_end_time'),
+        # PostgreSQL enforces the booking rules itself; create_show_submission checks them everywhere
+        db.CheckConstraint("end_time <= start_time + interval '1 day'", name='ck_Show_max_duration')
+        .ddl_if(dialect='postgresql'),
+        ExcludeConstraint(('venue_id', '='), (db.text('tstzrange(start_time, end_time)'), '&&'),
+                          name='ex_Show_venue_id_overlap', using='gist').ddl_if(dialect='postgresql'),
+        ExcludeConstraint(('artist_id', '='), (db.text('tstzrange(start_time, end_time)'), '&&'),
+                          name='ex_Show_artist_id_overlap', using='gist').ddl_if(dialect='postgresql'),
+    )
 
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), primary_key=True)
-    start_time = db.Column(db.String(120), primary_key=True)
-
-
-# ----------------------------------------------------------------------------#
-# Filters.
-# ----------------------------------------------------------------------------#
-
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en_US')
-
+    start_time = db.Column(UTCDateTime(timezone=True), primary_key=True)
+    end_time = db.Column(UTCDateTime(timezone=True), nullable=False)
+    updated_at = db.Column(UTCDateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow,
+                           server_default=func.now())
+    # whether the show is in the past_shows_count (rather than the upcoming_shows_count) of its venue
+    # and artist; set when the show is created, and by roll_show_counts once it has started
+    counted_past = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    @classmethod
+    def upcoming(cls, now, query=None):
+        return (cls.query if query is None else query).filter(cls.start_time >= now)
+
+    @classmethod
+    def past(cls, now, query=None):
+        return (cls.query if query is None else query).filter(cls.start_time < now)
+
+
+SINGLE_ROLL_SHOW_COUNTS = "kind = 'roll_show_counts' AND status IN ('queued', 'running')"
+
+
+class Job(db.Model):
+    """A background job; see jobs.JobQueue."""
+    __tablename__ = 'Job'
+    __table_args__ = (
+        db.Index('ix_Job_status_run_after', 'status', 'run_after'),
+        # listing_state reads the time of the last venue deletion on every listing request
+        db.Index('ix_Job_kind_finished_at', 'kind', 'finished_at'),
+        # roll_show_counts reschedules itself, so a second pending run would start a second chain
+        db.Index('ix_Job_single_roll_show_counts', 'kind', unique=True,
+                 postgresql_where=db.text(SINGLE_ROLL_SHOW_COUNTS), sqlite_where=db.text(SINGLE_ROLL_SHOW_COUNTS)),
+    )
 
-app.jinja_env.filters['datetime'] = format_datetime
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(16), nullable=False)
+    progress = db.Column(db.JSON, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(UTCDateTime(timezone=True), nullable=False, default=utcnow)
+    run_after = db.Column(UTCDateTime(timezone=True), nullable=False, default=utcnow)
+    locked_until = db.Column(UTCDateTime(timezone=True), nullable=True)
+    started_at = db.Column(UTCDateTime(timezone=True), nullable=True)
+    finished_at = db.Column(UTCDateTime(timezone=True), nullable=True)
 
 
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('pages/home.html')
 
@@ -110,60 +320,128 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@bp.route('/venues')
+@bp.route(API_PREFIX + '/venues', endpoint='api_venues')
+@negotiated
+@read_from_replica
+@conditional(lambda: listing_state(Venue))
 def venues():
-    def data_from_grouped_venue(item):
-        return {
-            "state": item[0][0],
-            "city": item[0][1],
-            "venues": [{
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": len(get_upcoming_shows(venue.shows))
-            } for venue in item[1]]
-        }
-
-    all_venues = Venue.query.all()
-
-    sorted_venues = sorted(sorted(all_venues, key=attrgetter('city')), key=attrgetter('state'))
-    grouped_venues = groupby(sorted_venues, key=attrgetter('state', 'city'))
-
-    data = [data_from_grouped_venue(item) for item in grouped_venues]
-
-    return render_template('pages/venues.html', areas=data)
-
-
-@app.route('/venues/search', methods=['POST'])
+    state = request.args.get('state')
+    city = request.args.get('city')
+    genre = request.args.get('genre')
+
+    query = db.session.query(Venue.state, Venue.city, Venue.id, Venue.name, Venue.upcoming_shows_count,
+                             Venue.updated_at)
+    if state:
+        query = query.filter(Venue.state == state)
+    if city:
+        query = query.filter(Venue.city == city)
+    if genre:
+        query = query.filter(Venue.genres.any(Genre.name == genre))
+    if wants_stream():
+        rows = query.order_by(Venue.state, Venue.city, Venue.id).yield_per(current_app.config['LISTING_STREAM_BATCH_SIZE'])
+        prev_cursor = next_cursor = None
+    else:
+        rows, prev_cursor, next_cursor = paginate_keyset(
+            query, [Venue.state, Venue.city, Venue.id], key=itemgetter(0, 1, 2),
+            per_page=current_app.config['LISTING_RESULTS_PER_PAGE'],
+            after=request.args.get('after'), before=request.args.get('before'))
+
+    if wants_json():
+        return api_response({
+            "data": [{
+                "id": row[2],
+                "name": row[3],
+                "city": row[1],
+                "state": row[0],
+                "num_upcoming_shows": row[4]
+            } for row in rows],
+            "prev_cursor": prev_cursor,
+            "next_cursor": next_cursor,
+        })
+
+    data = ({
+        "state": area[0],
+        "city": area[1],
+        "venues": [{
+            "id": row[2],
+            "name": row[3],
+            "num_upcoming_shows": row[4],
+            "updated_at": row[5],
+        } for row in area_rows]
+    } for area, area_rows in groupby(rows, key=itemgetter(0, 1)))
+
+    render = stream_page if wants_stream() else render_template
+    return render('pages/venues.html', areas=data, prev_cursor=prev_cursor, next_cursor=next_cursor)
+
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+@bp.route(API_PREFIX + '/venues/search', methods=['GET', 'POST'], endpoint='api_search_venues')
+@negotiated
+@read_from_replica
+@conditional(lambda: listing_state(Venue))
 def search_venues():
-    search = request.form.get('search_term')
-    venues = Venue.query.filter(func.lower(Venue.name).like(f"%{search.lower()}%")).all()
+    search = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    query = search_query(Venue.query, Venue.name, search)
+    results = query.paginate(page=page, per_page=current_app.config['SEARCH_RESULTS_PER_PAGE'], error_out=False)
+    venues = results.items
 
     response = {
-        "count": len(venues),
+        "count": results.total,
+        "page": results.page,
+        "prev_page": results.prev_num,
+        "next_page": results.next_num,
         "data": [{
             "id": venue.id,
             "name": venue.name,
-            "num_upcoming_shows": len(get_upcoming_shows(venue.shows)),
+            "num_upcoming_shows": venue.upcoming_shows_count,
         } for venue in venues]
     }
-    return render_template('pages/search_venues.html', results=response,
-                           search_term=request.form.get('search_term', ''))
+    if wants_json():
+        return api_response(response)
+    return render_template('pages/search_venues.html', results=response, search_term=search)
 
 
-@app.route('/venues/<int:venue_id>')
+@bp.route('/venues/<int:venue_id>')
+@bp.route(API_PREFIX + '/venues/<int:venue_id>', endpoint='api_show_venue')
+@negotiated
+@read_from_replica
 def show_venue(venue_id):
-    venue = Venue.query.get(venue_id)
+    cache_key = ('venue', venue_id)
+    # only HTML is cached, and never a page carrying a pending flash message
+    cacheable = not wants_json() and '_flashes' not in session
+    if cacheable:
+        cached = page_cache.get(cache_key)
+        if cached is not None:
+            body, etag, last_modified = cached
+            return not_modified(etag, last_modified) or with_validators(body, etag, last_modified)
+
+    now = utcnow()
+    if conditional_get() and (request.if_none_match or request.if_modified_since):
+        state = page_state(Venue, venue_id, Artist, Show.venue_id, Show.artist_id, now)
+        if state is None:
+            abort(404)
+        response = not_modified(*validators(*state))
+        if response is not None:
+            return response
+
+    venue = Venue.query.options(db.joinedload(Venue.genres)).get(venue_id)
 
     if venue is None:
-        return render_template('errors/404.html')
+        abort(404)
 
-    past_shows = get_past_shows(venue.shows)
-    upcoming_shows = get_upcoming_shows(venue.shows)
+    columns = (Show.artist_id, Show.start_time,
+               Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link'),
+               Show.updated_at.label('show_updated_at'), Artist.updated_at.label('listed_updated_at'))
+    venue_shows = Show.query.filter_by(venue_id=venue_id).join(Artist, Artist.id == Show.artist_id).with_entities(*columns)
+    past_shows = Show.past(now, venue_shows).order_by(Show.start_time).all()
+    upcoming_shows = Show.upcoming(now, venue_shows).order_by(Show.start_time).all()
 
     data = {
         "id": venue.id,
         "name": venue.name,
-        "genres": json.loads(venue.genres),
+        "genres": venue.genre_names,
         "address": venue.address,
         "city": venue.city,
         "state": venue.state,
@@ -175,33 +453,94 @@ def show_venue(venue_id):
         "image_link": venue.image_link,
         "past_shows": [{
             "artist_id": show.artist_id,
-            "artist_name": show.artist.name,
-            "artist_image_link": show.artist.image_link,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
             "start_time": show.start_time
         } for show in past_shows],
         "upcoming_shows": [{
             "artist_id": show.artist_id,
-            "artist_name": show.artist.name,
-            "artist_image_link": show.artist.image_link,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
             "start_time": show.start_time
         } for show in upcoming_shows],
         "past_shows_count": len(past_shows),
         "upcoming_shows_count": len(upcoming_shows),
     }
 
-    return render_template('pages/show_venue.html', venue=data)
+    etag, last_modified = validators(*loaded_page_state(venue.updated_at, past_shows, upcoming_shows))
+    if wants_json():
+        return with_validators(api_response({"data": data}), etag, last_modified)
+
+    # the loaded rows also carry the updated_at values keying the cached show tiles
+    body = render_template('pages/show_venue.html',
+                           venue=dict(data, past_shows=past_shows, upcoming_shows=upcoming_shows))
+    if cacheable:
+        # the past/upcoming split moves as soon as the next upcoming show starts
+        page_cache.set(cache_key, (body, etag, last_modified),
+                       expires_at=upcoming_shows[0].start_time if upcoming_shows else None)
+    return with_validators(body, etag, last_modified)
+
+
+@bp.route(API_PREFIX + '/venues/availability', endpoint='api_venues_availability')
+@bp.route(API_PREFIX + '/venues/<int:venue_id>/availability', endpoint='api_venue_availability')
+@read_from_replica
+@conditional(lambda venue_id=None: listing_state(Venue, Show))
+def venue_availability(venue_id=None):
+    """Free slots of one venue, or of every venue in a state (and city), between ``start`` and ``end``.
+
+    Only gaps of at least ``duration`` minutes (two hours by default) are listed.
+    """
+    start_time = parse_datetime(request.args.get('start'))
+    end_time = parse_datetime(request.args.get('end'))
+    min_length = timedelta(minutes=request.args.get('duration', DEFAULT_DURATION // timedelta(minutes=1), type=int))
+    state = request.args.get('state')
+    city = request.args.get('city')
+    if venue_id is None and not state:
+        return api_response({"error": "Pass the state, and optionally the city, of the venues."}, 400)
+    max_range = timedelta(days=current_app.config['AVAILABILITY_MAX_DAYS'])
+    if start_time is None or end_time is None or not start_time < end_time <= start_time + max_range:
+        return api_response({"error": f"Pass a start and an end at most {max_range.days} days apart."}, 400)
+
+    # one range query for the shows of every venue; venues without shows in the range come out once
+    # with no show
+    window = db.and_(Show.venue_id == Venue.id, Show.start_time > start_time - MAX_DURATION,
+                     Show.start_time < end_time, Show.end_time > start_time)
+    query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Show.start_time, Show.end_time)
+    query = query.outerjoin(Show, window)
+    if venue_id is not None:
+        query = query.filter(Venue.id == venue_id)
+    else:
+        query = query.filter(Venue.state == state)
+        if city:
+            query = query.filter(Venue.city == city)
+    rows = query.order_by(Venue.id, Show.start_time).all()
+    if venue_id is not None and not rows:
+        abort(404)
+
+    data = []
+    for venue, venue_rows in groupby(rows, key=itemgetter(0, 1, 2, 3)):
+        bookings = [(row.start_time, row.end_time) for row in venue_rows if row.start_time is not None]
+        data.append({
+            "venue_id": venue[0],
+            "venue_name": venue[1],
+            "city": venue[2],
+            "state": venue[3],
+            "free_slots": [{"start": start, "end": end}
+                           for start, end in free_slots(bookings, start_time, end_time, min_length)],
+        })
+    return api_response({"start": start_time, "end": end_time, "data": data})
 
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@bp.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@bp.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     form = request.form
 
@@ -218,11 +557,12 @@ def create_venue_submission():
                   state=state,
                   address=address,
                   phone=phone,
-                  genres=json.dumps(genres),
+                  genres=Genre.from_names(genres),
                   facebook_link=facebook_link)
     db.session.add(venue)
     try:
         db.session.commit()
+        typeahead.add('venue', venue.id, venue.name)
         flash('Venue ' + venue.name + ' was successfully listed!')
     except Exception as e:
         print(e, file=stderr)
@@ -234,70 +574,130 @@ def create_venue_submission():
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
+    if db.session.get(Venue, venue_id) is None:
+        abort(404)
+    # a venue may have thousands of shows, so a background job deletes them in batches
     try:
-        Venue.query.filter_by(id=venue_id).delete()
+        job_id = jobs.enqueue('delete_venue', {'venue_id': venue_id})
         db.session.commit()
-        flash(f"Venue with id {venue_id} was deleted successfully")
     except Exception as e:
         print(e, file=stderr)
         db.session.rollback()
         flash(f"Venue with id {venue_id} could not be deleted", category='error')
-        return render_template('errors/500.html')
+        return render_template('errors/500.html'), 500
     finally:
         db.session.close()
 
+    if wants_json():
+        return api_response({"job_id": job_id, "status_url": url_for('main.api_job_status', job_id=job_id)}, 202)
+    flash(f"Venue with id {venue_id} is being deleted")
+
     # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
     # clicking that button delete it from the db then redirect the user to the homepage
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@bp.route('/artists')
+@bp.route(API_PREFIX + '/artists', endpoint='api_artists')
+@negotiated
+@read_from_replica
+@conditional(lambda: listing_state(Artist))
 def artists():
-    all_artists = Artist.query.all()
-    data = [{
+    genre = request.args.get('genre')
+    query = db.session.query(Artist.id, Artist.name)
+    if genre:
+        query = query.filter(Artist.genres.any(Genre.name == genre))
+    if wants_stream():
+        rows = query.order_by(Artist.id).yield_per(current_app.config['LISTING_STREAM_BATCH_SIZE'])
+        prev_cursor = next_cursor = None
+    else:
+        rows, prev_cursor, next_cursor = paginate_keyset(
+            query, [Artist.id], key=lambda artist: (artist.id,),
+            per_page=current_app.config['LISTING_RESULTS_PER_PAGE'],
+            after=request.args.get('after'), before=request.args.get('before'))
+    data = ({
         "id": artist.id,
         "name": artist.name
-    } for artist in all_artists]
+    } for artist in rows)
 
-    return render_template('pages/artists.html', artists=data)
+    if wants_json():
+        return api_response({"data": list(data), "prev_cursor": prev_cursor, "next_cursor": next_cursor})
+    render = stream_page if wants_stream() else render_template
+    return render('pages/artists.html', artists=data, prev_cursor=prev_cursor, next_cursor=next_cursor)
 
 
-@app.route('/artists/search', methods=['POST'])
+@bp.route('/artists/search', methods=['GET', 'POST'])
+@bp.route(API_PREFIX + '/artists/search', methods=['GET', 'POST'], endpoint='api_search_artists')
+@negotiated
+@read_from_replica
+@conditional(lambda: listing_state(Artist))
 def search_artists():
-    search = request.form.get('search_term')
-    artists = Artist.query.filter(func.lower(Artist.name).like(f"%{search.lower()}%")).all()
+    search = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    query = search_query(Artist.query, Artist.name, search)
+    results = query.paginate(page=page, per_page=current_app.config['SEARCH_RESULTS_PER_PAGE'], error_out=False)
+    artists = results.items
 
     response = {
-        "count": len(artists),
+        "count": results.total,
+        "page": results.page,
+        "prev_page": results.prev_num,
+        "next_page": results.next_num,
         "data": [{
             "id": artist.id,
             "name": artist.name,
-            "num_upcoming_shows": len(get_upcoming_shows(artist.shows)),
+            "num_upcoming_shows": artist.upcoming_shows_count,
         } for artist in artists]
     }
 
-    return render_template('pages/search_artists.html', results=response,
-                           search_term=request.form.get('search_term', ''))
+    if wants_json():
+        return api_response(response)
+    return render_template('pages/search_artists.html', results=response, search_term=search)
 
 
-@app.route('/artists/<int:artist_id>')
+@bp.route('/artists/<int:artist_id>')
+@bp.route(API_PREFIX + '/artists/<int:artist_id>', endpoint='api_show_artist')
+@negotiated
+@read_from_replica
 def show_artist(artist_id):
-    artist = Artist.query.get(artist_id)
+    cache_key = ('artist', artist_id)
+    # only HTML is cached, and never a page carrying a pending flash message
+    cacheable = not wants_json() and '_flashes' not in session
+    if cacheable:
+        cached = page_cache.get(cache_key)
+        if cached is not None:
+            body, etag, last_modified = cached
+            return not_modified(etag, last_modified) or with_validators(body, etag, last_modified)
+
+    now = utcnow()
+    if conditional_get() and (request.if_none_match or request.if_modified_since):
+        state = page_state(Artist, artist_id, Venue, Show.artist_id, Show.venue_id, now)
+        if state is None:
+            abort(404)
+        response = not_modified(*validators(*state))
+        if response is not None:
+            return response
+
+    artist = Artist.query.options(db.joinedload(Artist.genres)).get(artist_id)
 
     if artist is None:
-        return render_template('errors/404.html')
+        abort(404)
 
-    past_shows = get_past_shows(artist.shows)
-    upcoming_shows = get_upcoming_shows(artist.shows)
+    columns = (Show.venue_id, Show.start_time,
+               Venue.name.label('venue_name'), Venue.image_link.label('venue_image_link'),
+               Show.updated_at.label('show_updated_at'), Venue.updated_at.label('listed_updated_at'))
+    artist_shows = Show.query.filter_by(artist_id=artist_id).join(Venue, Venue.id == Show.venue_id).with_entities(*columns)
+    past_shows = Show.past(now, artist_shows).order_by(Show.start_time).all()
+    upcoming_shows = Show.upcoming(now, artist_shows).order_by(Show.start_time).all()
 
     data = {
         "id": artist.id,
         "name": artist.name,
-        "genres": json.loads(artist.genres),
+        "genres": artist.genre_names,
         "city": artist.city,
         "state": artist.state,
         "phone": artist.phone,
@@ -308,26 +708,37 @@ def show_artist(artist_id):
         "image_link": artist.image_link,
         "past_shows": [{
             "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
-            "venue_image_link": show.venue.image_link,
+            "venue_name": show.venue_name,
+            "venue_image_link": show.venue_image_link,
             "start_time": show.start_time
         } for show in past_shows],
         "upcoming_shows": [{
             "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
-            "venue_image_link": show.venue.image_link,
+            "venue_name": show.venue_name,
+            "venue_image_link": show.venue_image_link,
             "start_time": show.start_time
         } for show in upcoming_shows],
         "past_shows_count": len(past_shows),
         "upcoming_shows_count": len(upcoming_shows),
     }
 
-    return render_template('pages/show_artist.html', artist=data)
+    etag, last_modified = validators(*loaded_page_state(artist.updated_at, past_shows, upcoming_shows))
+    if wants_json():
+        return with_validators(api_response({"data": data}), etag, last_modified)
+
+    # the loaded rows also carry the updated_at values keying the cached show tiles
+    body = render_template('pages/show_artist.html',
+                           artist=dict(data, past_shows=past_shows, upcoming_shows=upcoming_shows))
+    if cacheable:
+        # the past/upcoming split moves as soon as the next upcoming show starts
+        page_cache.set(cache_key, (body, etag, last_modified),
+                       expires_at=upcoming_shows[0].start_time if upcoming_shows else None)
+    return with_validators(body, etag, last_modified)
 
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     artist = Artist.query.get(artist_id)
 
@@ -337,7 +748,7 @@ def edit_artist(artist_id):
     data = {
         "id": artist.id,
         "name": artist.name,
-        "genres": json.loads(artist.genres),
+        "genres": artist.genre_names,
         "city": artist.city,
         "state": artist.state,
         "phone": artist.phone,
@@ -351,13 +762,13 @@ def edit_artist(artist_id):
                       city=artist.city,
                       state=artist.state,
                       phone=artist.phone,
-                      genres=json.loads(artist.genres),
+                      genres=artist.genre_names,
                       facebook_link=artist.facebook_link)
 
     return render_template('forms/edit_artist.html', form=form, artist=data)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     form = request.form
 
@@ -370,21 +781,25 @@ def edit_artist_submission(artist_id):
     artist.city = form.get('city')
     artist.state = form.get('state')
     artist.phone = form.get('phone')
-    artist.genres = json.dumps(form.getlist('genres'))
+    artist.genres = Genre.from_names(form.getlist('genres'))
     artist.facebook_link = form.get('facebook_link')
+    # set explicitly: a change to the genres alone does not update the artist row
+    artist.updated_at = utcnow()
 
     try:
         db.session.commit()
+        page_cache.invalidate(*artist_page_keys(artist_id))
+        typeahead.add('artist', artist_id, form.get('name'))
     except:
         db.session.rollback()
         return render_template('errors/500.html')
     finally:
         db.session.close()
 
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('main.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     venue = Venue.query.get(venue_id)
 
@@ -397,13 +812,13 @@ def edit_venue(venue_id):
         state=venue.state,
         address=venue.address,
         phone=venue.phone,
-        genres=json.loads(venue.genres),
+        genres=venue.genre_names,
         facebook_link=venue.facebook_link,
     )
     data = {
         "id": venue.id,
         "name": venue.name,
-        "genres": json.loads(venue.genres),
+        "genres": venue.genre_names,
         "address": venue.address,
         "city": venue.city,
         "state": venue.state,
@@ -417,7 +832,7 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=data)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     form = request.form
 
@@ -431,30 +846,34 @@ def edit_venue_submission(venue_id):
     venue.state = form.get('state')
     venue.address = form.get('address')
     venue.phone = form.get('phone')
-    venue.genres = json.dumps(form.getlist('genres'))
+    venue.genres = Genre.from_names(form.getlist('genres'))
     venue.facebook_link = form.get('facebook_link')
+    # set explicitly: a change to the genres alone does not update the venue row
+    venue.updated_at = utcnow()
 
     try:
         db.session.commit()
+        page_cache.invalidate(*venue_page_keys(venue_id))
+        typeahead.add('venue', venue_id, form.get('name'))
     except:
         db.session.rollback()
         return render_template('errors/500.html')
     finally:
         db.session.close()
 
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@bp.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@bp.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     form = request.form
 
@@ -469,11 +888,12 @@ def create_artist_submission():
                     city=city,
                     state=state,
                     phone=phone,
-                    genres=json.dumps(genres),
+                    genres=Genre.from_names(genres),
                     facebook_link=facebook_link)
     try:
         db.session.add(artist)
         db.session.commit()
+        typeahead.add('artist', artist.id, artist.name)
         flash('Artist ' + artist.name + ' was successfully listed!')
     except:
         db.session.rollback()
@@ -487,40 +907,81 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@bp.route('/shows')
+@bp.route(API_PREFIX + '/shows', endpoint='api_shows')
+@negotiated
+@read_from_replica
+@conditional(lambda: listing_state(Show, Venue, Artist))
 def shows():
-    all_shows = Show.query.all()
-    data = [{
+    query = db.session.query(Show.start_time, Show.venue_id, Show.artist_id,
+                             Venue.name.label('venue_name'), Artist.name.label('artist_name'),
+                             Artist.image_link.label('artist_image_link'), Show.updated_at,
+                             Venue.updated_at.label('venue_updated_at'), Artist.updated_at.label('artist_updated_at'))
+    query = query.join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id)
+    if wants_stream():
+        query = query.order_by(Show.start_time, Show.venue_id, Show.artist_id)
+        rows = query.yield_per(current_app.config['LISTING_STREAM_BATCH_SIZE'])
+        prev_cursor = next_cursor = None
+    else:
+        rows, prev_cursor, next_cursor = paginate_keyset(
+            query, [Show.start_time, Show.venue_id, Show.artist_id],
+            key=attrgetter('start_time', 'venue_id', 'artist_id'),
+            per_page=current_app.config['LISTING_RESULTS_PER_PAGE'],
+            after=request.args.get('after'), before=request.args.get('before'))
+    data = ({
         "venue_id": show.venue_id,
-        "venue_name": show.venue.name,
+        "venue_name": show.venue_name,
         "artist_id": show.artist_id,
-        "artist_name": show.artist.name,
-        "artist_image_link": show.artist.image_link,
+        "artist_name": show.artist_name,
+        "artist_image_link": show.artist_image_link,
         "start_time": show.start_time
-    } for show in all_shows]
+    } for show in rows)
 
-    return render_template('pages/shows.html', shows=data)
+    if wants_json():
+        return api_response({"data": list(data), "prev_cursor": prev_cursor, "next_cursor": next_cursor})
+    render = stream_page if wants_stream() else render_template
+    # the rows also carry the updated_at values keying the cached show tiles
+    return render('pages/shows.html', shows=rows, prev_cursor=prev_cursor, next_cursor=next_cursor)
 
 
-@app.route('/shows/create')
+@bp.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@bp.route('/shows/create', methods=['POST'])
 def create_show_submission():
     form = request.form
 
-    artist_id = form.get('artist_id')
-    venue_id = form.get('venue_id')
-    start_time = form.get('start_time')
+    artist_id = form.get('artist_id', type=int)
+    venue_id = form.get('venue_id', type=int)
+    start_time = parse_datetime(form.get('start_time'))
+    duration = timedelta(minutes=form.get('duration', DEFAULT_DURATION // timedelta(minutes=1), type=int))
 
-    show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time)
+    if None in (artist_id, venue_id, start_time) or not timedelta() < duration <= MAX_DURATION:
+        flash('An error occurred. Show could not be listed.')
+        return render_template('pages/home.html')
+
+    # PostgreSQL rejects overlapping shows on its own; this check covers the other databases and
+    # names the conflict
+    end_time = start_time + duration
+    clashes = db.session.execute(overlapping(Show.__table__, start_time, end_time, venue_id, artist_id)).all()
+    if clashes:
+        booked = 'venue' if any(clash.venue_id == venue_id for clash in clashes) else 'artist'
+        flash(f'Show could not be listed: the {booked} already has a show at that time.', category='error')
+        return render_template('pages/home.html')
+
+    show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=end_time,
+                counted_past=start_time < utcnow())
     try:
         db.session.add(show)
+        count_shows(db.session, db.metadata.tables, [{
+            'venue_id': venue_id, 'artist_id': artist_id, 'counted_past': show.counted_past,
+        }])
         db.session.commit()
+        page_cache.invalidate(('venue', int(venue_id)), ('artist', int(artist_id)))
         flash('Show was successfully listed!')
     except Exception as e:
         db.session.rollback()
@@ -531,46 +992,426 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+@bp.route('/jobs/<int:job_id>')
+@bp.route(API_PREFIX + '/jobs/<int:job_id>', endpoint='api_job_status')
+def job_status(job_id):
+    job = Job.query.get(job_id)
+    if job is None:
+        abort(404)
+    return api_response({"data": {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "progress": job.progress,
+        "result": job.result,
+        # the last line of the traceback, which names the exception
+        "error": job.error.strip().splitlines()[-1] if job.error else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }})
+
+
+@bp.route('/autocomplete')
+@bp.route(API_PREFIX + '/autocomplete', endpoint='api_autocomplete')
+def autocomplete():
+    """Venues and artists whose name, or a word in it, starts with ``q``; answered from memory, without a query.
+
+    ``type`` (venue or artist, repeatable) narrows the kinds, and ``limit`` the number of suggestions.
+    """
+    kinds = request.args.getlist('type') or ['venue', 'artist']
+    if not set(kinds) <= {'venue', 'artist'}:
+        return api_response({"error": "The type is either venue or artist."}, 400)
+    max_results = current_app.config['AUTOCOMPLETE_MAX_RESULTS']
+    limit = min(max(request.args.get('limit', max_results, type=int), 1), max_results)
+
+    suggestions = typeahead.suggest(request.args.get('q', ''), kinds, limit)
+    if suggestions is None:
+        return api_response({"error": "Suggestions are not available right now."}, 503)
+    return api_response({"data": [{
+        "type": kind,
+        "id": entry_id,
+        "name": name,
+        "url": url_for(f'main.show_{kind}', **{f'{kind}_id': entry_id}),
+    } for kind, entry_id, name in suggestions]})
+
+
+@bp.route('/cache/stats')
+def cache_stats():
+    return jsonify(dict(page_cache.stats(), fragments=fragment_cache.stats()))
+
+
+@bp.route('/metrics')
+def metrics():
+    return metrics_response()
+
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
+    if wants_json():
+        return api_response({"error": "Not found"}, 404)
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(error):
+    if wants_json():
+        return api_response({"error": "Internal server error"}, 500)
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+# ----------------------------------------------------------------------------#
+# Utils.
+# ----------------------------------------------------------------------------#
+def listing_state(*models):
+    """Newest ``updated_at`` of each of ``models``, and when a venue was last deleted, read in one query.
+
+    Edits and inserts move the newest ``updated_at``. Artists are never deleted, and venues (with
+    their shows) only by delete_venue_job, so the time the last of those jobs finished stands in for
+    deletes. Show counts live on the Venue and Artist rows, so a change to them moves the newest
+    ``updated_at`` too.
+    """
+    columns = [db.select(func.max(model.updated_at)).scalar_subquery() for model in models]
+    if Venue in models or Show in models:
+        columns.append(db.select(func.max(Job.finished_at))
+                       .where(Job.kind == 'delete_venue', Job.status == DONE).scalar_subquery())
+    return tuple(db.session.query(*columns).one())
+
+
+def page_state(model, model_id, listed, key, listed_key, now):
+    """State of a venue or artist page, aggregated in the database; None when there is no such row.
+
+    ``listed`` is the model on the other side of the page's shows, joined through ``listed_key``.
+    Gives the same values as ``loaded_page_state`` does for the rows the page loads.
+    """
+    row = db.session.query(
+        model.updated_at, func.max(Show.updated_at), func.max(listed.updated_at), func.count(Show.start_time),
+        func.max(db.case((Show.start_time < now, Show.start_time))),
+    ).outerjoin(Show, key == model.id).outerjoin(listed, listed.id == listed_key) \
+        .filter(model.id == model_id).group_by(model.id, model.updated_at).first()
+    return None if row is None else tuple(row)
+
+
+def loaded_page_state(updated_at, past_shows, upcoming_shows):
+    """State of a venue or artist page, worked out from its loaded rows (see ``page_state``)."""
+    shows = past_shows + upcoming_shows
+    return (updated_at,
+            max((show.show_updated_at for show in shows), default=None),
+            max((show.listed_updated_at for show in shows), default=None),
+            len(shows),
+            past_shows[-1].start_time if past_shows else None)
+
+
+@typeahead.source('venue')
+def venue_names():
+    return db.session.query(Venue.id, Venue.name).all()
+
+
+@typeahead.source('artist')
+def artist_names():
+    return db.session.query(Artist.id, Artist.name).all()
+
+
+def parse_datetime(value):
+    """Parse a date and time typed into a form, taking it as UTC unless it names its timezone; None if invalid."""
+    try:
+        value = dateutil.parser.parse(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return value.replace(tzinfo=pytz.UTC) if value.tzinfo is None else value.astimezone(pytz.UTC)
+
+
+def wants_stream():
+    """True when an HTML listing was asked for in full (``?stream=1``) rather than one page at a time."""
+    return request.args.get('stream') == '1' and not wants_json()
+
+
+def stream_page(template_name, **context):
+    """Render a template as a streamed response, like ``flask.stream_template``.
+
+    The layout head goes out as soon as it is rendered, while the iterables in ``context`` are
+    consumed as the body streams. Output is flushed in batches of template events rather than
+    one chunk per expression.
+    """
+    current_app.update_template_context(context)
+    stream = current_app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(current_app.config['STREAM_BUFFER_SIZE'])
+    return Response(stream_with_context(stream), mimetype='text/html')
+
+
+def run_import(kind, path, rows, batch_size, on_reject):
+    """Load the file at ``path`` with the importer of ``kind``; ``rows(file)`` yields its records.
+
+    Returns the importer, holding the counts of loaded and rejected rows, and the seconds taken.
+    """
+    started = time.perf_counter()
+    with db.engine.connect() as connection, open(path, newline='', encoding='utf-8') as file:
+        importer = IMPORTERS[kind](connection, db.metadata.tables, batch_size=batch_size, on_reject=on_reject)
+        importer.run(rows(file))
+    return importer, time.perf_counter() - started
+
+
+def recount_shows():
+    """Recompute the show counts of every venue and artist from the Show table, and commit.
+
+    Returns the number of shows moved between upcoming and past, and of venues and artists fixed.
+    """
+    now = utcnow()
+    shows = Show.__table__
+    moved = db.session.execute(db.update(shows).where(shows.c.counted_past != (shows.c.start_time < now))
+                               .values(counted_past=shows.c.start_time < now)).rowcount
+    fixed = 0
+    for model, key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        counted = db.select(func.count()).select_from(Show).where(key == model.id)
+        upcoming = counted.where(~Show.counted_past).scalar_subquery()
+        past = counted.where(Show.counted_past).scalar_subquery()
+        fixed += db.session.execute(
+            db.update(model.__table__)
+            .where(db.or_(model.upcoming_shows_count != upcoming, model.past_shows_count != past))
+            .values(upcoming_shows_count=upcoming, past_shows_count=past)).rowcount
+    db.session.commit()
+    return moved, fixed
+
+
+def reject_writer(file):
+    """An ``on_reject`` callback writing rejected rows to ``file`` as JSON lines."""
+
+    def on_reject(number, row, errors):
+        file.write(json.dumps({"row_number": number, "row": row, "errors": errors}) + '\n')
+
+    return on_reject
+
+
+def venue_page_keys(venue_id):
+    """Cache keys of the venue page and of every artist page that lists a show at the venue."""
+    artist_ids = db.session.query(Show.artist_id).filter_by(venue_id=venue_id).distinct()
+    return [('venue', venue_id)] + [('artist', row.artist_id) for row in artist_ids]
+
+
+def artist_page_keys(artist_id):
+    """Cache keys of the artist page and of every venue page that lists a show by the artist."""
+    venue_ids = db.session.query(Show.venue_id).filter_by(artist_id=artist_id).distinct()
+    return [('artist', artist_id)] + [('venue', row.venue_id) for row in venue_ids]
 
 
 # ----------------------------------------------------------------------------#
-# Utils.
+# Jobs.
 # ----------------------------------------------------------------------------#
-def get_upcoming_shows(shows):
-    return list(
-        filter(
-            lambda show: dateutil.parser.parse(show.start_time) >= datetime.now(pytz.UTC),
-            shows
-        )
-    )
 
+@jobs.handler('delete_venue')
+def delete_venue_job(run, venue_id):
+    """Delete a venue and its shows, JOB_BATCH_SIZE shows per transaction, taking them off the artists' show counts.
+
+    Once the venue is gone, its page and the pages of its artists are dropped from the page cache and the
+    venue from the typeahead indexes of this process; other processes catch up within RESPONSE_CACHE_TTL
+    and TYPEAHEAD_REFRESH seconds.
+    """
+    batch_size = current_app.config['JOB_BATCH_SIZE']
+    # looked up before the shows linking the venue to its artists are gone
+    page_keys = venue_page_keys(venue_id)
+    total = Show.query.filter_by(venue_id=venue_id).count()
+    deleted = 0
+    while True:
+        # the start of the batch's last show: everything up to it goes in this transaction
+        last = db.session.query(Show.start_time).filter_by(venue_id=venue_id).order_by(Show.start_time) \
+            .offset(batch_size - 1).limit(1).scalar()
+        shows = Show.query.filter_by(venue_id=venue_id)
+        if last is not None:
+            shows = shows.filter(Show.start_time <= last)
+        # locked, so roll_show_counts cannot move them between the counts before they are gone
+        counted = shows.with_entities(Show.venue_id, Show.artist_id, Show.counted_past).with_for_update().all()
+        count_shows(db.session, db.metadata.tables, [show._mapping for show in counted], sign=-1)
+        deleted += shows.delete(synchronize_session=False)
+        db.session.commit()
+        run.progress(deleted_shows=deleted, total_shows=total)
+        if last is None:
+            break
+
+    db.session.execute(venue_genres.delete().where(venue_genres.c.venue_id == venue_id))
+    found = Venue.query.filter_by(id=venue_id).delete()
+    db.session.commit()
+    page_cache.invalidate(*page_keys)
+    typeahead.remove('venue', venue_id)
+    return {"venue_deleted": bool(found), "deleted_shows": deleted}
+
+
+@jobs.handler('roll_show_counts')
+def roll_show_counts_job(run):
+    """Move the shows that started since the last run from the upcoming to the past counts of their venue and artist.
+
+    Then reschedules itself for when the next show starts, or SHOW_COUNTS_INTERVAL seconds from now
+    if that is sooner, since shows booked in the meantime may start first. `flask worker` queues the
+    first run, and the same Job row serves every run after it.
+    """
+    now = utcnow()
+    shows = Show.__table__
+    started = db.session.execute(
+        db.update(shows).where(~shows.c.counted_past, shows.c.start_time < now).values(counted_past=True)
+        .returning(shows.c.venue_id, shows.c.artist_id)).all()
+    count_shows(db.session, db.metadata.tables, [dict(show._mapping, counted_past=False) for show in started], sign=-1)
+    count_shows(db.session, db.metadata.tables, [dict(show._mapping, counted_past=True) for show in started])
+
+    next_run = now + timedelta(seconds=current_app.config['SHOW_COUNTS_INTERVAL'])
+    next_start = db.session.query(func.min(Show.start_time)).filter(~Show.counted_past).scalar()
+    if next_start is not None:
+        next_run = min(next_run, next_start)
+    db.session.commit()
+    run.reschedule(next_run)
+    return {"started_shows": len(started), "next_run": next_run.isoformat()}
+
+
+@jobs.handler('reindex')
+def reindex_job(run, tables=None):
+    """Rebuild the indexes of ``tables`` (all of them by default) and refresh their planner statistics."""
+    names = tables or sorted(db.metadata.tables)
+    unknown = set(names) - set(db.metadata.tables)
+    if unknown:
+        raise ValueError(f'Unknown tables: {", ".join(sorted(unknown))}')
+    quote = db.engine.dialect.identifier_preparer.quote
+    # PostgreSQL rebuilds the indexes next to the old ones, without blocking writes
+    reindex = 'REINDEX TABLE CONCURRENTLY {}' if db.engine.dialect.name == 'postgresql' else 'REINDEX {}'
+    with db.engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+        for number, name in enumerate(names, 1):
+            connection.execute(db.text(reindex.format(quote(name))))
+            connection.execute(db.text(f'ANALYZE {quote(name)}'))
+            run.progress(tables_done=number, tables=len(names))
+    return {"tables": names}
+
+
+@jobs.handler('import')
+def import_job(run, kind, path, file_format, batch_size=None, rejects=None):
+    """Run a `flask import` queued with --background."""
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+
+    def rows(file):
+        for number, row in enumerate(read_rows(file, file_format), 1):
+            yield row
+            if number % batch_size == 0:
+                run.progress(rows_read=number)
+
+    def on_reject(number, row, errors):
+        current_app.logger.warning('Import job %s rejected row %d: %s', run.id, number, errors)
+
+    with open(rejects, 'w') if rejects else nullcontext() as rejects_file:
+        importer, seconds = run_import(kind, path, rows, batch_size,
+                                       reject_writer(rejects_file) if rejects_file else on_reject)
+    return {"loaded": importer.loaded, "rejected": importer.rejected, "seconds": round(seconds, 1)}
 
-def get_past_shows(shows):
-    return list(
-        filter(
-            lambda show: dateutil.parser.parse(show.start_time) < datetime.now(pytz.UTC),
-            shows
-        )
-    )
+
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+
+@bp.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format_', type=click.Choice(IMPORT_FORMATS),
+              help='File format; taken from the file extension by default.')
+@click.option('--batch-size', type=int, help='Rows per transaction (IMPORT_BATCH_SIZE by default).')
+@click.option('--rejects', type=click.Path(dir_okay=False, writable=True),
+              help='Write rejected rows to this file as JSON lines.')
+@click.option('--background', is_flag=True, help='Queue the import as a job for `flask worker` instead.')
+def import_command(kind, path, format_, batch_size, rejects, background):
+    """Bulk load venues, artists or shows from a CSV or JSONL file.
+
+    Rows are validated like the forms of the web UI, and shows may name their venue and artist
+    instead of giving their ids.
+    """
+    format_ = format_ or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+
+    if background:
+        job_id = jobs.enqueue('import', {
+            'kind': kind,
+            'path': os.path.abspath(path),
+            'file_format': format_,
+            'batch_size': batch_size,
+            'rejects': rejects and os.path.abspath(rejects),
+        })
+        db.session.commit()
+        click.echo(f'Queued import job {job_id}.')
+        return
+
+    def on_reject(number, row, errors):
+        click.echo(f'Rejected row {number}: {errors}', err=True)
+
+    with open(rejects, 'w') if rejects else nullcontext() as rejects_file:
+        importer, seconds = run_import(kind, path, lambda file: read_rows(file, format_), batch_size,
+                                       reject_writer(rejects_file) if rejects_file else on_reject)
+
+    click.echo(f'Imported {importer.loaded} {kind} in {seconds:.1f}s '
+               f'({importer.loaded / seconds:.0f} rows/s); rejected {importer.rejected} rows.')
+
+
+@bp.cli.command('worker')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty instead of waiting for more jobs.')
+@click.option('--poll', type=float, default=1.0, show_default=True, help='Seconds between looks at an empty queue.')
+def worker_command(burst, poll):
+    """Run background jobs: venue deletions, reindexing, imports queued with --background and show counts.
+
+    SIGTERM or Ctrl-C stops the worker once the job at hand is finished.
+    """
+    if not jobs.pending('roll_show_counts'):
+        try:
+            jobs.enqueue('roll_show_counts')
+            db.session.commit()
+        except IntegrityError:
+            # a worker starting at the same time queued it first
+            db.session.rollback()
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: stopping.append(signum))
+    ran = jobs.work(burst=burst, poll=poll, should_stop=lambda: bool(stopping))
+    click.echo(f'Ran {ran} jobs.')
+
+
+@bp.cli.command('reindex')
+@click.argument('tables', nargs=-1)
+def reindex_command(tables):
+    """Queue a job rebuilding the indexes of TABLES (all tables by default) and refreshing their statistics."""
+    job_id = jobs.enqueue('reindex', {'tables': list(tables) or None})
+    db.session.commit()
+    click.echo(f'Queued reindex job {job_id}.')
+
+
+@bp.cli.command('recount-shows')
+def recount_shows_command():
+    """Recompute the show counts of every venue and artist from the Show table.
+
+    Only needed after shows were written without going through the app, e.g. by hand in SQL.
+    """
+    moved, fixed = recount_shows()
+    click.echo(f'Moved {moved} shows between upcoming and past; fixed the counts of {fixed} venues and artists.')
+
+
+@bp.cli.command('precompile-templates')
+def precompile_templates_command():
+    """Compile every template into the bytecode cache (TEMPLATE_CACHE_DIR).
+
+    Run it at build time, so that no worker compiles templates.
+    """
+    directory = template_cache.directory(current_app)
+    if directory is None:
+        raise click.ClickException('There is no template cache directory; set TEMPLATE_CACHE_DIR.')
+    started = time.perf_counter()
+    names = template_cache.precompile(current_app)
+    click.echo(f'Compiled {len(names)} templates into {directory} '
+               f'in {time.perf_counter() - started:.1f}s.')
+
+
+@bp.cli.command('build-assets')
+def build_assets_command():
+    """Bundle, minify, fingerprint and precompress the static files into static/build.
+
+    Run it on every deploy that changes a static file; the app serves the build from its next start.
+    """
+    manifest = build_assets(current_app.static_folder, current_app.static_url_path)
+    compressed = sum(1 for encodings in manifest['encodings'].values() if encodings)
+    if not any('br' in encodings for encodings in manifest['encodings'].values()):
+        click.echo('The brotli package is not installed: only gzip variants were written.', err=True)
+    click.echo(f"Built {len(manifest['files'])} assets, {compressed} of them precompressed, into static/build.")
 
 
 # ----------------------------------------------------------------------------#
@@ -579,11 +1420,11 @@ def get_past_shows(shows):
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,189 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # optional: without it the build only writes gzip variants
+    brotli = None
+
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+
+# Each bundle is built from its sources, in order, into one fingerprinted file
+BUNDLES = {
+    'css/app.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css', 'css/main.responsive.css',
+                    'css/main.quickfix.css'],
+    'js/head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    'js/app.js': ['js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+}
+
+# Types worth compressing; images and woff fonts are compressed already
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.json', '.txt'}
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/|\s+', re.S)
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(css):
+    """Drop comments and needless whitespace from a stylesheet, leaving strings alone."""
+
+    def token(match):
+        if match.group(1):
+            return match.group(1)
+        return '' if match.group(0).startswith('/*') else ' '
+
+    parts = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', _CSS_TOKENS.sub(token, css))
+    # odd parts are strings
+    return ''.join(part if index % 2 else _CSS_PUNCTUATION.sub(r'\1', part)
+                   for index, part in enumerate(parts)).replace(';}', '}').strip()
+
+
+def minify_js(js):
+    """Drop whole-line comments, indentation and blank lines; anything cleverer needs a real JS parser."""
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+class AssetPipeline:
+    """Serves static files under content-hashed names, bundled, minified and precompressed by `flask build-assets`.
+
+    The build writes every static file, and every bundle of BUNDLES, to static/build under a name
+    carrying a hash of its content, next to gzip (and, with the optional brotli package, brotli)
+    variants and a manifest. Once a build exists, ``url_for('static', filename=...)`` and
+    ``asset_urls(bundle)`` in templates point at the hashed names, and those are served with the
+    best variant the client accepts and an immutable Cache-Control of a year. Without a build, or
+    without ASSETS_USE_BUILD, the source files are served as they are.
+
+    The manifest each app serves from is kept in its ``extensions['assets']``.
+    """
+
+    def init_app(self, app):
+        manifest = {'files': {}, 'encodings': {}}
+        path = manifest_path(app)
+        if app.config['ASSETS_USE_BUILD'] and os.path.exists(path):
+            with open(path) as file:
+                manifest = json.load(file)
+        app.extensions['assets'] = manifest
+        app.url_defaults(self._hashed_filename)
+        app.view_functions['static'] = self.send_static
+        app.jinja_env.globals['asset_urls'] = self.urls
+
+    def urls(self, bundle):
+        """URLs to include for ``bundle``: the built file, or its sources when there is no build."""
+        names = [bundle] if bundle in current_app.extensions['assets']['files'] else BUNDLES[bundle]
+        return [url_for('static', filename=name) for name in names]
+
+    def send_static(self, filename):
+        encodings = current_app.extensions['assets']['encodings'].get(filename)
+        if encodings is None:
+            return current_app.send_static_file(filename)
+
+        for encoding, suffix in ENCODINGS:
+            if encoding in encodings and request.accept_encodings[encoding]:
+                response = send_from_directory(current_app.static_folder, filename + suffix,
+                                               mimetype=mimetypes.guess_type(filename)[0])
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(current_app.static_folder, filename)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        return response
+
+    def _hashed_filename(self, endpoint, values):
+        files = current_app.extensions['assets']['files']
+        if endpoint == 'static' and values.get('filename') in files:
+            values['filename'] = files[values['filename']]
+
+
+def manifest_path(app):
+    return os.path.join(app.static_folder, BUILD_DIR, MANIFEST)
+
+
+def build(static_folder, static_url_path):
+    """Write the fingerprinted, minified and precompressed assets and their manifest; returns the manifest.
+
+    Stylesheets are rewritten to refer to the hashed names of the fonts and images they use.
+    """
+    build_folder = os.path.join(static_folder, BUILD_DIR)
+    shutil.rmtree(build_folder, ignore_errors=True)
+    files = {}
+    encodings = {}
+
+    def write(name, content):
+        root, extension = posixpath.splitext(name)
+        hashed = f'{BUILD_DIR}/{root}.{hashlib.sha256(content).hexdigest()[:12]}{extension}'
+        path = os.path.join(static_folder, *hashed.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+        files[name] = hashed
+        encodings[hashed] = []
+        if extension in COMPRESSIBLE:
+            for encoding, suffix in ENCODINGS:
+                if encoding == 'br' and brotli is None:
+                    continue
+                compressed = brotli.compress(content) if encoding == 'br' else gzip.compress(content, 9, mtime=0)
+                # a variant barely smaller than the file is not worth the decompression
+                if len(compressed) < len(content) * 0.9:
+                    with open(path + suffix, 'wb') as file:
+                        file.write(compressed)
+                    encodings[hashed].append(encoding)
+
+    sources = []
+    for root, dirs, names in os.walk(static_folder):
+        dirs[:] = sorted(name for name in dirs if os.path.join(root, name) != build_folder)
+        sources += [posixpath.join(*os.path.relpath(os.path.join(root, name), static_folder).split(os.sep))
+                    for name in sorted(names) if not name.startswith('.')]
+
+    # fonts and images first, so the stylesheets can refer to their hashed names
+    for name in sorted(sources, key=lambda name: name.endswith(('.css', '.js'))):
+        with open(os.path.join(static_folder, *name.split('/')), 'rb') as file:
+            content = file.read()
+        if name.endswith('.css'):
+            content = _rewrite_urls(content.decode('utf-8'), name, files, static_url_path).encode('utf-8')
+        write(name, content)
+
+    for bundle, names in BUNDLES.items():
+        parts = []
+        for name in names:
+            with open(os.path.join(static_folder, *name.split('/')), encoding='utf-8') as file:
+                content = file.read()
+            if name.endswith('.css'):
+                parts.append(minify_css(_rewrite_urls(content, name, files, static_url_path)))
+            else:
+                # a script without a final semicolon must not run into the next one
+                parts.append((content if name.endswith('.min.js') else minify_js(content)).rstrip() + ';')
+        write(bundle, '\n'.join(parts).encode('utf-8'))
+
+    manifest = {'files': files, 'encodings': encodings}
+    with open(os.path.join(build_folder, MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    return manifest
+
+
+def _rewrite_urls(css, name, files, static_url_path):
+    # relative URLs are resolved against the source stylesheet, since the built one lives elsewhere
+    def rewrite(match):
+        url = match.group(2).strip()
+        if re.match(r'^(?:[a-z]+:|/|#)', url, re.I):
+            return match.group(0)
+        path, _, suffix = re.match(r'([^?#]*)(([?#].*)?)', url).group(1, 2, 3)
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(name), path))
+        return f'url("{static_url_path}/{files.get(target, target)}{suffix or ""}")'
+
+    return _CSS_URL.sub(rewrite, css)
@@ -0,0 +1,121 @@
+from bisect import bisect_left, insort
+from datetime import timedelta
+from itertools import chain
+
+from sqlalchemy import and_, bindparam, or_, select, update
+
+# Shows last DEFAULT_DURATION unless told otherwise, and never longer than MAX_DURATION. The bound
+# keeps overlap checks to an index range scan: a show overlapping [start, end) must have started
+# within MAX_DURATION before ``start``.
+DEFAULT_DURATION = timedelta(hours=2)
+MAX_DURATION = timedelta(days=1)
+
+
+def overlapping(shows, start_time, end_time, venue_id=None, artist_id=None):
+    """Select the shows of ``shows`` (the Show table) at the venue or by the artist that overlap [start_time, end_time)."""
+    window = and_(shows.c.start_time > start_time - MAX_DURATION, shows.c.start_time < end_time,
+                  shows.c.end_time > start_time)
+    owners = []
+    if venue_id is not None:
+        owners.append(shows.c.venue_id == venue_id)
+    if artist_id is not None:
+        owners.append(shows.c.artist_id == artist_id)
+    return select(shows.c.venue_id, shows.c.artist_id, shows.c.start_time, shows.c.end_time) \
+        .where(window, or_(*owners))
+
+
+def free_slots(bookings, start_time, end_time, min_length=timedelta()):
+    """The gaps of at least ``min_length`` left in [start_time, end_time) by ``bookings``.
+
+    ``bookings`` are (start, end) pairs sorted by start, and may reach beyond the range. One sweep
+    over them gives the gaps as (start, end) pairs, in order.
+    """
+    free = []
+    cursor = start_time
+    for booked_start, booked_end in chain(bookings, [(end_time, end_time)]):
+        booked_start = min(booked_start, end_time)
+        if booked_start > cursor and booked_start - cursor >= min_length:
+            free.append((cursor, booked_start))
+        cursor = max(cursor, booked_end)
+    return free
+
+
+def count_shows(connection, tables, shows, sign=1):
+    """Add ``shows`` to the show counts of their venues and artists, or take them off with ``sign=-1``.
+
+    ``shows`` are mappings with venue_id, artist_id and counted_past: a show counts as past once
+    counted_past is set, and as upcoming until then. Each of the Venue and Artist tables gets one
+    executemany UPDATE, in id order, so concurrent transactions lock the rows in the same order.
+    """
+    for table_name, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        deltas = {}
+        for show in shows:
+            delta = deltas.setdefault(show[key], {'owner_id': show[key], 'upcoming': 0, 'past': 0})
+            delta['past' if show['counted_past'] else 'upcoming'] += sign
+        if not deltas:
+            continue
+        table = tables[table_name]
+        connection.execute(update(table).where(table.c.id == bindparam('owner_id')).values(
+            upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming'),
+            past_shows_count=table.c.past_shows_count + bindparam('past'),
+        ), [deltas[owner_id] for owner_id in sorted(deltas)])
+
+
+class Schedule:
+    """The booked intervals of venues and artists, for checking many bookings in one pass.
+
+    The shows of a venue or artist are read from the database once, the first time a booking
+    involves them, with one query per ``load``. After that every booking is checked with a binary
+    search and, once accepted, ``add``-ed so the bookings are checked against each other too.
+    """
+
+    def __init__(self, shows):
+        self.shows = shows
+        self.venues = {}
+        self.artists = {}
+
+    def load(self, connection, bookings):
+        """Read the booked shows of the venues and artists of ``bookings`` that are not known yet."""
+        venue_ids = {booking['venue_id'] for booking in bookings} - self.venues.keys()
+        artist_ids = {booking['artist_id'] for booking in bookings} - self.artists.keys()
+        if not venue_ids and not artist_ids:
+            return
+        for venue_id in venue_ids:
+            self.venues[venue_id] = []
+        for artist_id in artist_ids:
+            self.artists[artist_id] = []
+        shows = self.shows
+        query = select(shows.c.venue_id, shows.c.artist_id, shows.c.start_time, shows.c.end_time) \
+            .where(or_(shows.c.venue_id.in_(venue_ids), shows.c.artist_id.in_(artist_ids)))
+        for show in connection.execute(query):
+            if show.venue_id in venue_ids:
+                insort(self.venues[show.venue_id], (show.start_time, show.end_time))
+            if show.artist_id in artist_ids:
+                insort(self.artists[show.artist_id], (show.start_time, show.end_time))
+
+    def conflicts(self, booking):
+        """Field errors for a booking overlapping a known show, in the format of form errors."""
+        errors = {}
+        if _overlaps(self.venues.get(booking['venue_id'], ()), booking['start_time'], booking['end_time']):
+            errors['venue_id'] = ['The venue already has a show at that time.']
+        if _overlaps(self.artists.get(booking['artist_id'], ()), booking['start_time'], booking['end_time']):
+            errors['artist_id'] = ['The artist already has a show at that time.']
+        return errors
+
+    def add(self, booking):
+        interval = (booking['start_time'], booking['end_time'])
+        insort(self.venues.setdefault(booking['venue_id'], []), interval)
+        insort(self.artists.setdefault(booking['artist_id'], []), interval)
+
+
+def _overlaps(intervals, start_time, end_time):
+    # only shows starting within MAX_DURATION before the booking can reach into it
+    position = bisect_left(intervals, (end_time,))
+    while position > 0:
+        position -= 1
+        other_start, other_end = intervals[position]
+        if other_start <= start_time - MAX_DURATION:
+            return False
+        if other_end > start_time:
+            return True
+    return False
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+
+import pytz
+from flask import current_app
+
+
+class ResponseCache:
+    """Keeps a ``ResponseStore`` of rendered pages per app, in ``app.extensions``.
+
+    Its methods act on the store of ``current_app``, so several apps in one process (e.g. in tests)
+    never see each other's pages.
+    """
+
+    def init_app(self, app):
+        hold = app.config['DB_REPLICA_LAG'] if app.config['DB_REPLICA_URLS'] else None
+        app.extensions['page_cache'] = ResponseStore(app.config['RESPONSE_CACHE_SIZE'],
+                                                     app.config['RESPONSE_CACHE_TTL'], hold)
+
+    @staticmethod
+    def store():
+        return current_app.extensions['page_cache']
+
+    def get(self, key):
+        return self.store().get(key)
+
+    def set(self, key, value, expires_at=None):
+        self.store().set(key, value, expires_at)
+
+    def invalidate(self, *keys):
+        self.store().invalidate(*keys)
+
+    def clear(self):
+        self.store().clear()
+
+    def stats(self):
+        return self.store().stats()
+
+
+class ResponseStore:
+    """A bounded, in-process LRU of rendered pages with per-entry expiry and hit/miss counters.
+
+    Entries are dropped explicitly through ``invalidate`` when the underlying rows change, when
+    their own ``expires_at`` passes, or after ``ttl`` seconds at the latest. The cache lives in
+    the worker process, so ``ttl`` bounds how stale a page can get on workers that did not see
+    the write themselves. With ``hold`` set, an invalidated key is not stored again for that many
+    seconds, so a page rendered from a lagging read replica does not re-enter the cache.
+    """
+
+    def __init__(self, max_entries=1024, ttl=None, hold=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hold = hold
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._held = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        now = datetime.now(pytz.UTC)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, expires_at=None):
+        now = datetime.now(pytz.UTC)
+        if self.ttl is not None:
+            ttl_expiry = now + timedelta(seconds=self.ttl)
+            expires_at = ttl_expiry if expires_at is None else min(expires_at, ttl_expiry)
+        with self._lock:
+            if key in self._held and self._held[key] > now:
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        now = datetime.now(pytz.UTC)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            if self.hold:
+                self._held = {key: until for key, until in self._held.items() if until > now}
+                self._held.update((key, now + timedelta(seconds=self.hold)) for key in keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
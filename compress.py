@@ -0,0 +1,131 @@
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are never brotli-encoded
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: without it responses are never zstd-encoded
+    zstandard = None
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+CODECS = {'gzip': _Gzip}
+if brotli is not None:
+    CODECS['br'] = _Brotli
+if zstandard is not None:
+    CODECS['zstd'] = _Zstd
+
+
+class Compression:
+    """Compresses responses on the fly, in the best encoding the client accepts (zstd, brotli or gzip).
+
+    Only types listed in COMPRESS_LEVELS are compressed, each at its own level per encoding, and
+    only bodies of at least COMPRESS_MIN_SIZE bytes; zstd and brotli need the optional zstandard and
+    brotli packages. Streamed responses are compressed chunk by chunk, each chunk flushed as it
+    goes, so the browser still gets the top of the page early. Responses that are encoded already
+    (the precompressed static files) or sent straight from a file are left alone.
+
+    A compressed response is a different representation, so its ETag turns weak. A weak ETag
+    still answers If-None-Match, so the conditional GETs of the views work unchanged.
+
+    The settings of each app are kept in its ``extensions['compression']``.
+    """
+
+    def init_app(self, app):
+        app.extensions['compression'] = {
+            'levels': app.config['COMPRESS_LEVELS'],
+            'min_size': app.config['COMPRESS_MIN_SIZE'],
+            'encodings': [encoding for encoding in app.config['COMPRESS_ENCODINGS'] if encoding in CODECS],
+        }
+        app.after_request(self._compress)
+
+    def _compress(self, response):
+        settings = current_app.extensions['compression']
+        levels = settings['levels'].get(response.mimetype)
+        if levels is None or response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+        # the response depends on Accept-Encoding whether or not this one gets compressed
+        response.vary.add('Accept-Encoding')
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if response.cache_control.no_transform:
+            return response
+        offered = [encoding for encoding in settings['encodings'] if encoding in levels]
+        encoding = request.accept_encodings.best_match(offered)
+        if encoding is None:
+            return response
+
+        codec = CODECS[encoding]
+        if response.is_streamed:
+            response.response = self._stream(response.response, response.iter_encoded(), codec(levels[encoding]))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < settings['min_size']:
+                return response
+            compressor = codec(levels[encoding])
+            response.set_data(compressor.compress(data) + compressor.finish())
+        response.content_encoding = encoding
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    @staticmethod
+    def _stream(body, chunks, compressor):
+        try:
+            for chunk in chunks:
+                if chunk:
+                    yield compressor.compress(chunk) + compressor.flush()
+            yield compressor.finish()
+        finally:
+            # the response now closes this generator instead of the body, which may hold the
+            # request context of stream_with_context open
+            if hasattr(body, 'close'):
+                body.close()
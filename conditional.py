@@ -0,0 +1,94 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+from api import wants_json
+
+
+def code_version(app):
+    """Fingerprint of the app's modules, templates and built assets, so a deploy that changes the markup changes ETags.
+
+    It hashes what the files hold, not when they were written, so every host running the same code
+    agrees on it, deploy after deploy.
+    """
+    digest = hashlib.sha1()
+    paths = [os.path.join(app.root_path, name) for name in sorted(os.listdir(app.root_path)) if name.endswith('.py')]
+    for root, dirs, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        dirs.sort()
+        paths += [os.path.join(root, name) for name in sorted(files)]
+    # pages link to the hashed names of the static files, which change with every asset build
+    manifest = os.path.join(app.static_folder, 'build', 'manifest.json')
+    if os.path.exists(manifest):
+        paths.append(manifest)
+    for path in paths:
+        with open(path, 'rb') as file:
+            content = file.read()
+        name = os.path.relpath(path, app.root_path).replace(os.sep, '/')
+        digest.update(f'{name}:{len(content)}:'.encode())
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def conditional_get():
+    """True when the response to this request may carry validators and be answered with a 304.
+
+    Pages carrying a flash message are personal to the visitor and never take part.
+    """
+    return request.method in ('GET', 'HEAD') and '_flashes' not in session
+
+
+def validators(*state):
+    """The strong ETag and the Last-Modified date of the page built from ``state``.
+
+    ``state`` holds the values the page depends on (newest updated_at, deletion times, ...). The ETag
+    also covers the URL with its query string, the representation (HTML or JSON) and the code
+    version. Last-Modified is the newest datetime in ``state``.
+    """
+    # timestamps are compared by instant, whatever tzinfo object the driver handed back
+    values = tuple(value.astimezone(timezone.utc).isoformat() if isinstance(value, datetime) else value
+                   for value in state)
+    key = repr((current_app.extensions['code_version'], request.full_path, wants_json(), values))
+    last_modified = max((value for value in state if isinstance(value, datetime)), default=None)
+    return hashlib.sha1(key.encode()).hexdigest(), last_modified
+
+
+def not_modified(etag, last_modified):
+    """A 304 response when the request's If-None-Match or If-Modified-Since still holds, else None."""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(('', 304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified):
+    response = make_response(response)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def conditional(state):
+    """Answer conditional GETs of a view whose output only changes along with ``state(*args, **kwargs)``.
+
+    ``state`` runs before the view, so a request whose validators still match gets its 304 without
+    the view running at all.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not conditional_get():
+                return view(*args, **kwargs)
+            etag, last_modified = validators(*state(*args, **kwargs))
+            response = not_modified(etag, last_modified)
+            if response is not None:
+                return response
+            return with_validators(view(*args, **kwargs), etag, last_modified)
+
+        return wrapper
+
+    return decorator
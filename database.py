@@ -0,0 +1,71 @@
+import random
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+def engine_options(url, pool_size, max_overflow, pool_recycle, pool_pre_ping, statement_timeout):
+    """Engine keyword arguments for ``url``; pool sizing and timeouts only apply to server databases."""
+    options = {'pool_pre_ping': pool_pre_ping}
+    if make_url(url).get_backend_name() == 'sqlite':
+        return options
+    options.update(pool_size=pool_size, max_overflow=max_overflow, pool_recycle=pool_recycle)
+    if statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    return options
+
+
+def configure_engines(config):
+    """Fill in the Flask-SQLAlchemy engine settings of ``config`` from its DB_* values.
+
+    Every URL in DB_REPLICA_URLS becomes a bind named ``replica_<n>`` with the same pool settings
+    as the primary. Returns the names of those binds.
+    """
+    settings = (config['DB_POOL_SIZE'], config['DB_MAX_OVERFLOW'], config['DB_POOL_RECYCLE'],
+                config['DB_POOL_PRE_PING'], config['DB_STATEMENT_TIMEOUT'])
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config['SQLALCHEMY_DATABASE_URI'], *settings)
+
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    replicas = []
+    for index, url in enumerate(config['DB_REPLICA_URLS']):
+        key = f'{REPLICA_BIND_PREFIX}{index}'
+        binds[key] = dict(engine_options(url, *settings), url=url)
+        replicas.append(key)
+    config['SQLALCHEMY_BINDS'] = binds
+    return replicas
+
+
+class RoutingSession(Session):
+    """Session that sends the queries of replica-enabled requests to the replica chosen for them.
+
+    Flushes always go to the primary, and a commit pins the client to the primary for
+    DB_REPLICA_LAG seconds so it reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('db_replica'):
+            return current_app.extensions['sqlalchemy'].engines[g.db_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        super().commit()
+        if has_request_context() and current_app.extensions.get('db_replicas'):
+            session['db_primary_until'] = time.time() + current_app.config['DB_REPLICA_LAG']
+
+
+def read_from_replica(view):
+    """Let a read-only view run its queries against one of the configured read replicas."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replicas = current_app.extensions.get('db_replicas')
+        if replicas and session.get('db_primary_until', 0) < time.time():
+            g.db_replica = random.choice(replicas)
+        return view(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,39 @@
+from datetime import datetime
+from functools import lru_cache
+
+import babel
+import babel.dates
+import dateutil.parser
+import pytz
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+LOCALE = babel.Locale.parse('en_US')
+
+_compiled_patterns = {}
+
+
+def _compiled_pattern(format):
+    pattern = _compiled_patterns.get(format)
+    if pattern is None:
+        pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+        _compiled_patterns[format] = pattern
+    return pattern
+
+
+@lru_cache(maxsize=4096)
+def _format_datetime(value, utcoffset, format):
+    # utcoffset is part of the cache key only: equal instants in different zones format differently
+    return _compiled_pattern(format).apply(value, LOCALE)
+
+
+def format_datetime(value, format='medium'):
+    """Format a datetime (or a string holding one) with a named format or a Babel pattern."""
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=pytz.UTC)
+    return _format_datetime(value, value.utcoffset(), format)
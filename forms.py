@@ -1,7 +1,9 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, NumberRange, Optional
+
+from booking import DEFAULT_DURATION, MAX_DURATION
 
 
 class ShowForm(Form):
@@ -16,6 +18,11 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=MAX_DURATION // timedelta(minutes=1))],
+        default=DEFAULT_DURATION // timedelta(minutes=1)
+    )
 
 
 class VenueForm(Form):
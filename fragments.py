@@ -0,0 +1,148 @@
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+
+from flask import current_app
+from jinja2 import Undefined, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class RedisFragments:
+    """A fragment store shared by every worker, in Redis (needs the optional ``redis`` package)."""
+
+    def __init__(self, url, ttl=None):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.errors = redis.RedisError
+        self.ttl = ttl
+
+    def get(self, key):
+        try:
+            value = self.client.get('fyyur:fragment:' + key)
+        except self.errors:
+            current_app.logger.exception('Reading a fragment from Redis failed')
+            return None
+        return None if value is None else value.decode()
+
+    def set(self, key, value):
+        try:
+            self.client.set('fyyur:fragment:' + key, value.encode(), ex=self.ttl)
+        except self.errors:
+            current_app.logger.exception('Writing a fragment to Redis failed')
+
+
+class FragmentCache:
+    """Adds the ``{% cache %}`` tag to an app, with a ``FragmentStore`` of its own.
+
+    The store is the app's ``jinja_env.fragment_cache`` and ``extensions['fragment_cache']``;
+    ``clear`` and ``stats`` act on the store of ``current_app``.
+    """
+
+    def init_app(self, app):
+        shared = None
+        if app.config['FRAGMENT_CACHE_URL']:
+            shared = RedisFragments(app.config['FRAGMENT_CACHE_URL'], app.config['FRAGMENT_CACHE_TTL'])
+        store = FragmentStore(app.config['FRAGMENT_CACHE_SIZE'], shared)
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = store
+        app.extensions['fragment_cache'] = store
+
+    @staticmethod
+    def store():
+        return current_app.extensions['fragment_cache']
+
+    def clear(self):
+        self.store().clear()
+
+    def stats(self):
+        return self.store().stats()
+
+
+class FragmentStore:
+    """Caches rendered pieces of templates, marked with ``{% cache key, ... %}...{% endcache %}``.
+
+    The key names the entity the fragment shows: its id, plus the ``updated_at`` of every row the
+    fragment reads from, so an edit makes a new key and stale fragments never need invalidating.
+    The template, the position of the tag in it and the code version are added to the key, and
+    the fragment is rendered again only when the key is new. Fragments are kept in a bounded
+    in-process LRU (FRAGMENT_CACHE_SIZE entries), in front of a store shared by all workers when
+    FRAGMENT_CACHE_URL names one.
+    """
+
+    def __init__(self, max_entries=20000, shared=None):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def render(self, key, render):
+        """The fragment cached under ``key`` (a hashable tuple), or the output of ``render()``, which is then cached.
+
+        A hit costs one dict lookup: the key is only serialized for the shared store, on a miss.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        shared_key = None
+        if self.shared is not None:
+            shared_key = shared_fragment_key(current_app.extensions['code_version'], *key)
+            value = self.shared.get(shared_key)
+        if value is None:
+            value = str(render())
+            if shared_key is not None:
+                self.shared.set(shared_key, value)
+        value = Markup(value)
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def shared_fragment_key(*parts):
+    # timestamps are keyed by instant, whatever tzinfo object the driver handed back, as aware
+    # datetimes already compare and hash in the local cache
+    values = tuple(part.astimezone(timezone.utc).isoformat() if isinstance(part, datetime) else part
+                   for part in parts)
+    return hashlib.sha1(repr(values).encode()).hexdigest()
+
+
+class FragmentCacheExtension(Extension):
+    """The ``{% cache %}`` tag of ``FragmentCache``; renders through the ``FragmentStore`` of its environment."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [nodes.Const(parser.name), nodes.Const(lineno), nodes.Tuple(key, 'load')])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, template_name, lineno, key, caller):
+        # lists (e.g. of the ids of a block's rows) are frozen so the key can be hashed
+        key = tuple(tuple(part) if isinstance(part, list) else part for part in key)
+        # a key missing a value (e.g. while templates warm up) would stand for any entity
+        if any(isinstance(part, Undefined) for part in key):
+            return caller()
+        return self.environment.fragment_cache.render((template_name, lineno, *key), caller)
@@ -0,0 +1,336 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytz
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from werkzeug.datastructures import MultiDict
+
+from booking import Schedule, count_shows
+from forms import ArtistForm, ShowForm, VenueForm
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+BOOLEAN_VALUES = {
+    'true': True, 't': True, 'yes': True, 'y': True, '1': True,
+    'false': False, 'f': False, 'no': False, 'n': False, '0': False,
+}
+
+PendingRow = namedtuple('PendingRow', 'number row record')
+
+
+def read_rows(file, format):
+    """Yield the records of a CSV or JSONL file one at a time; unparsable JSON lines come out as None."""
+    if format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def formdata(row, multiple=()):
+    """Turn an imported record into form data; ``multiple`` fields may be lists or comma separated strings."""
+    data = MultiDict()
+    for key, value in row.items():
+        if key is None or value is None or value == '':
+            continue
+        if key in multiple and isinstance(value, str):
+            value = [item.strip() for item in value.split(',') if item.strip()]
+        for item in value if isinstance(value, list) else [value]:
+            data.add(key, str(item))
+    return data
+
+
+def copy_rows(connection, table, rows):
+    """Insert ``rows`` (dicts keyed by column name) into ``table``, streaming them through COPY on PostgreSQL."""
+    if not rows:
+        return
+    if connection.dialect.name != 'postgresql':
+        connection.execute(table.insert(), rows)
+        return
+
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(row[column]) for column in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    quote = connection.dialect.identifier_preparer.quote
+    statement = 'COPY {} ({}) FROM STDIN'.format(quote(table.name), ', '.join(quote(column) for column in columns))
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    except connection.dialect.dbapi.Error as error:
+        # the raw cursor bypasses SQLAlchemy, so wrap driver errors the way it would have
+        raise DBAPIError.instance(statement, None, error, connection.dialect.dbapi.Error) from error
+    finally:
+        cursor.close()
+
+
+def _copy_value(value):
+    # COPY text format: \N is NULL, and backslash, tab and line breaks are escaped
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class BulkImporter:
+    """Validates records with the forms of forms.py and loads them in batched transactions.
+
+    Every batch is written in one transaction. When a batch fails (e.g. on a duplicate key) it is split
+    in halves and retried until only the offending rows are left, and those are rejected. Rejections
+    are passed to ``on_reject(number, row, errors)`` with the 1-based record number.
+    """
+
+    form_class = None
+
+    def __init__(self, connection, tables, batch_size=5000, on_reject=None):
+        self.connection = connection
+        self.tables = tables
+        self.batch_size = batch_size
+        self.on_reject = on_reject
+        self.form = self.form_class(meta={'csrf': False})
+        self.seen = set()
+        self.loaded = 0
+        self.rejected = 0
+
+    def run(self, rows):
+        batch = []
+        for number, row in enumerate(rows, 1):
+            if not isinstance(row, dict):
+                self.reject(number, row, {'row': ['Not a valid JSON object.']})
+                continue
+            record, errors = self.prepare(row)
+            if errors:
+                self.reject(number, row, errors)
+                continue
+            key = self.key(record)
+            if key in self.seen:
+                self.reject(number, row, {'row': ['Duplicate of an earlier row.']})
+                continue
+            self.seen.add(key)
+            batch.append(PendingRow(number, row, record))
+            if len(batch) >= self.batch_size:
+                self.flush(self.screen(batch))
+                batch = []
+        self.flush(self.screen(batch))
+        return self
+
+    def validate(self, data):
+        self.form.process(data)
+        if self.form.validate():
+            return None
+        return self.form.errors
+
+    def prepare(self, row):
+        """Return the record to load for ``row`` and None, or None and a dict of field errors."""
+        raise NotImplementedError
+
+    def key(self, record):
+        """The unique key of ``record``, used to reject duplicates within the import before they reach the database."""
+        raise NotImplementedError
+
+    def screen(self, batch):
+        """Return the rows of ``batch`` that pass checks needing the database, rejecting the others."""
+        return batch
+
+    def load(self, batch):
+        """Write the records of ``batch`` in the current transaction."""
+        raise NotImplementedError
+
+    def flush(self, batch):
+        if not batch:
+            return
+        try:
+            with self.connection.begin():
+                self.load(batch)
+        except DBAPIError as error:
+            if len(batch) == 1:
+                self.reject(batch[0].number, batch[0].row, {'row': [str(error.orig).strip()]})
+                return
+            # bisect, so a few bad rows cost a few extra transactions rather than one per row
+            middle = len(batch) // 2
+            self.flush(batch[:middle])
+            self.flush(batch[middle:])
+        else:
+            self.loaded += len(batch)
+
+    def reject(self, number, row, errors):
+        self.rejected += 1
+        if self.on_reject is not None:
+            self.on_reject(number, row, errors)
+
+
+class ListingImporter(BulkImporter):
+    """Imports venues or artists together with their genres."""
+
+    table_name = None
+    genre_table_name = None
+    owner_column = None
+    seeking_column = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.table = self.tables[self.table_name]
+        self.genre_table = self.tables[self.genre_table_name]
+        genres = self.tables['Genre']
+        with self.connection.begin():
+            self.genre_ids = dict(self.connection.execute(select(genres.c.name, genres.c.id)).all())
+
+    def prepare(self, row):
+        errors = self.validate(formdata(row, multiple=('genres',)))
+        seeking = _boolean(row.get(self.seeking_column))
+        if seeking is None:
+            errors = dict(errors or {}, **{self.seeking_column: ['Not a valid boolean value.']})
+        if errors:
+            return None, errors
+
+        record = {field.name: field.data for field in self.form if field.name != 'genres'}
+        record.update(phone=record['phone'] or '', image_link=record['image_link'] or '',
+                      website=row.get('website') or None, seeking_description=row.get('seeking_description') or None)
+        record[self.seeking_column] = seeking
+        return (record, self.genre_id_list(self.form.genres.data)), None
+
+    def genre_id_list(self, names):
+        missing = [name for name in names if name not in self.genre_ids]
+        if missing:
+            genres = self.tables['Genre']
+            with self.connection.begin():
+                copy_rows(self.connection, genres, [{'name': name} for name in missing])
+                query = select(genres.c.name, genres.c.id).where(genres.c.name.in_(missing))
+                self.genre_ids.update(self.connection.execute(query).all())
+        return [self.genre_ids[name] for name in dict.fromkeys(names)]
+
+    def key(self, record):
+        return record[0]['name']
+
+    def load(self, batch):
+        copy_rows(self.connection, self.table, [pending.record[0] for pending in batch])
+        names = [pending.record[0]['name'] for pending in batch]
+        query = select(self.table.c.name, self.table.c.id).where(self.table.c.name.in_(names))
+        ids = dict(self.connection.execute(query).all())
+        copy_rows(self.connection, self.genre_table, [
+            {self.owner_column: ids[pending.record[0]['name']], 'genre_id': genre_id}
+            for pending in batch for genre_id in pending.record[1]
+        ])
+
+
+class VenueImporter(ListingImporter):
+    form_class = VenueForm
+    table_name = 'Venue'
+    genre_table_name = 'VenueGenre'
+    owner_column = 'venue_id'
+    seeking_column = 'seeking_talent'
+
+
+class ArtistImporter(ListingImporter):
+    form_class = ArtistForm
+    table_name = 'Artist'
+    genre_table_name = 'ArtistGenre'
+    owner_column = 'artist_id'
+    seeking_column = 'seeking_venue'
+
+
+class ShowImporter(BulkImporter):
+    """Imports shows, referring to their venue and artist by id (venue_id, artist_id) or by name (venue, artist).
+
+    A show may give its ``duration`` in minutes. Shows overlapping another show at the same venue or
+    by the same artist, whether already booked or earlier in the import, are rejected. Each batch is
+    checked with a single query for the bookings of venues and artists it is the first to mention.
+    The show counts of the venues and artists are updated in the transaction of each batch.
+    """
+
+    form_class = ShowForm
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        venues, artists = self.tables['Venue'], self.tables['Artist']
+        with self.connection.begin():
+            self.venue_ids = dict(self.connection.execute(select(venues.c.name, venues.c.id)).all())
+            self.artist_ids = dict(self.connection.execute(select(artists.c.name, artists.c.id)).all())
+        self.venue_id_set = set(self.venue_ids.values())
+        self.artist_id_set = set(self.artist_ids.values())
+        self.schedule = Schedule(self.tables['Show'])
+
+    def prepare(self, row):
+        errors = {}
+        venue_id = _resolve(row, 'venue', self.venue_ids, self.venue_id_set, errors)
+        artist_id = _resolve(row, 'artist', self.artist_ids, self.artist_id_set, errors)
+        errors.update(self.validate(formdata({key: row.get(key) for key in ('start_time', 'duration')})) or {})
+        if errors:
+            return None, errors
+        start_time = self.form.start_time.data.replace(tzinfo=pytz.UTC)
+        end_time = start_time + timedelta(minutes=self.form.duration.data)
+        return {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time, 'end_time': end_time,
+                'counted_past': start_time < datetime.now(pytz.UTC)}, None
+
+    def key(self, record):
+        return record['venue_id'], record['artist_id'], record['start_time']
+
+    def screen(self, batch):
+        with self.connection.begin():
+            self.schedule.load(self.connection, [pending.record for pending in batch])
+        passed = []
+        for pending in batch:
+            errors = self.schedule.conflicts(pending.record)
+            if errors:
+                self.reject(pending.number, pending.row, errors)
+                continue
+            self.schedule.add(pending.record)
+            passed.append(pending)
+        return passed
+
+    def load(self, batch):
+        records = [pending.record for pending in batch]
+        copy_rows(self.connection, self.tables['Show'], records)
+        count_shows(self.connection, self.tables, records)
+
+
+IMPORTERS = {
+    'venues': VenueImporter,
+    'artists': ArtistImporter,
+    'shows': ShowImporter,
+}
+
+
+def _boolean(value):
+    if value is None or value == '' or isinstance(value, bool):
+        return bool(value)
+    return BOOLEAN_VALUES.get(str(value).strip().lower())
+
+
+def _resolve(row, name, ids_by_name, ids, errors):
+    """Look up the id of the ``name`` ('venue' or 'artist') a show row refers to, by id or by name."""
+    field = name + '_id'
+    value = row.get(field)
+    if value not in (None, ''):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            errors[field] = ['Not a valid integer value.']
+            return None
+        if value not in ids:
+            errors[field] = [f'No {name} with id {value}.']
+            return None
+        return value
+    if not row.get(name):
+        errors[field] = [f'Either {field} or {name} is required.']
+        return None
+    if row[name] not in ids_by_name:
+        errors[name] = [f'No {name} named {row[name]!r}.']
+        return None
+    return ids_by_name[row[name]]
@@ -0,0 +1,162 @@
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import pytz
+from flask import current_app
+from sqlalchemy import and_, func, or_, select, update
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """Background jobs kept in the Job table and run by `flask worker` processes; no broker needed.
+
+    ``enqueue`` adds a job in the caller's transaction, so the job only exists once the caller
+    commits. A worker claims one job at a time. On PostgreSQL it uses SELECT ... FOR UPDATE SKIP
+    LOCKED, so several workers never wait on each other. Elsewhere, a conditional UPDATE decides
+    which worker got a job. A claimed job is leased for JOB_LEASE seconds and the lease is renewed
+    whenever the job reports progress, so the job of a worker that died is picked up again once its
+    lease runs out. A failing job is retried with a growing delay, up to JOB_MAX_ATTEMPTS times.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.handlers = {}
+
+    def init_app(self, app):
+        app.extensions['jobs'] = self
+
+    @property
+    def table(self):
+        return self.db.metadata.tables['Job']
+
+    def handler(self, kind):
+        """Register the decorated function as the handler of jobs of ``kind``.
+
+        It is called with a ``JobRun`` and the job's payload as keyword arguments, and returns the
+        job's result (anything JSON serializable).
+        """
+
+        def decorator(function):
+            self.handlers[kind] = function
+            return function
+
+        return decorator
+
+    def enqueue(self, kind, payload=None, run_after=None):
+        """Add a job to the current transaction of the session; returns its id.
+
+        ``payload`` is a dict of the keyword arguments to call the handler with.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f'No handler for jobs of kind {kind!r}.')
+        values = {'kind': kind, 'payload': payload or {}, 'status': QUEUED, 'attempts': 0}
+        if run_after is not None:
+            values['run_after'] = run_after
+        return self.db.session.execute(self.table.insert().values(values)).inserted_primary_key[0]
+
+    def pending(self, kind, statuses=(QUEUED, RUNNING)):
+        """Number of jobs of ``kind`` in one of ``statuses``."""
+        table = self.table
+        query = select(func.count()).select_from(table).where(table.c.kind == kind, table.c.status.in_(statuses))
+        return self.db.session.execute(query).scalar()
+
+    def claim(self, worker):
+        """Take the next job that is due, or whose lease ran out, for ``worker``; None if there is none."""
+        table = self.table
+        now = datetime.now(pytz.UTC)
+        due = or_(and_(table.c.status == QUEUED, table.c.run_after <= now),
+                  and_(table.c.status == RUNNING, table.c.locked_until < now))
+        with self.db.engine.begin() as connection:
+            query = select(table.c.id).where(due).order_by(table.c.run_after, table.c.id).limit(1)
+            job_id = connection.execute(query.with_for_update(skip_locked=True)).scalar()
+            if job_id is None:
+                return None
+            claimed = connection.execute(update(table).where(table.c.id == job_id, due).values(
+                status=RUNNING, worker=worker, attempts=table.c.attempts + 1, started_at=now,
+                locked_until=now + timedelta(seconds=current_app.config['JOB_LEASE'])))
+            if claimed.rowcount == 0:
+                return None
+            return connection.execute(select(table).where(table.c.id == job_id)).one()
+
+    def run(self, job):
+        """Run a claimed job to completion and record its result, or its error."""
+        handler = self.handlers.get(job.kind)
+        run = JobRun(self, job)
+        try:
+            if handler is None:
+                raise LookupError(f'No handler for jobs of kind {job.kind!r}.')
+            result = handler(run, **job.payload)
+        except Exception:
+            self.db.session.rollback()
+            error = traceback.format_exc()
+            current_app.logger.error('Job %s (%s) failed:\n%s', job.id, job.kind, error)
+            retry = handler is not None and job.attempts < current_app.config['JOB_MAX_ATTEMPTS']
+            delay = timedelta(seconds=current_app.config['JOB_RETRY_DELAY'] * 2 ** (job.attempts - 1))
+            self._finish(job, error=error, status=QUEUED if retry else FAILED,
+                         run_after=datetime.now(pytz.UTC) + delay if retry else job.run_after)
+            return False
+        finally:
+            self.db.session.remove()
+        if run.next_run is not None:
+            self._finish(job, result=result, status=QUEUED, run_after=run.next_run, attempts=0)
+        else:
+            self._finish(job, result=result, status=DONE)
+        return True
+
+    def work(self, burst=False, poll=1.0, should_stop=lambda: False):
+        """Claim and run jobs until ``should_stop()``, or until the queue is empty if ``burst``."""
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        ran = 0
+        while not should_stop():
+            job = self.claim(worker)
+            if job is None:
+                if burst:
+                    break
+                time.sleep(poll)
+                continue
+            self.run(job)
+            ran += 1
+        return ran
+
+    def _finish(self, job, **values):
+        now = datetime.now(pytz.UTC)
+        if values['status'] != QUEUED:
+            values['finished_at'] = now
+        table = self.table
+        with self.db.engine.begin() as connection:
+            connection.execute(update(table).where(table.c.id == job.id).values(locked_until=None, **values))
+
+
+class JobRun:
+    """Handed to a job handler: the job being run, and a way to report progress."""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job = job
+        self.next_run = None
+
+    @property
+    def id(self):
+        return self.job.id
+
+    def progress(self, **values):
+        """Record ``values`` as the job's progress and renew its lease; handlers call this between batches."""
+        table = self.queue.table
+        lease = timedelta(seconds=current_app.config['JOB_LEASE'])
+        with self.queue.db.engine.begin() as connection:
+            connection.execute(update(table).where(table.c.id == self.job.id).values(
+                progress=values, locked_until=datetime.now(pytz.UTC) + lease))
+
+    def reschedule(self, run_after):
+        """Have the job run again at ``run_after`` once it returns, as the same row, instead of finishing.
+
+        Recurring jobs use it, so they keep a single row rather than queueing a new job for each run.
+        """
+        self.next_run = run_after
@@ -0,0 +1,135 @@
+import time
+
+from flask import Response, current_app, g, has_app_context, has_request_context, request, template_rendered
+from flask.signals import before_render_template
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+registry = CollectorRegistry()
+
+REQUESTS = Counter(
+    'fyyur_requests_total', 'Requests handled, by endpoint and status code.',
+    ['endpoint', 'status'], registry=registry)
+REQUEST_DURATION = Histogram(
+    'fyyur_request_duration_seconds', 'Time from the start of a request until its response is fully sent.',
+    ['endpoint'], registry=registry)
+SQL_QUERIES = Histogram(
+    'fyyur_sql_queries_per_request', 'SQL statements executed per request.',
+    ['endpoint'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200), registry=registry)
+SQL_DURATION = Histogram(
+    'fyyur_sql_duration_seconds', 'Time spent executing SQL statements per request.',
+    ['endpoint'], registry=registry)
+TEMPLATE_DURATION = Histogram(
+    'fyyur_template_render_seconds', 'Time spent rendering templates per request.',
+    ['endpoint'], registry=registry)
+RESPONSE_SIZE = Histogram(
+    'fyyur_response_size_bytes', 'Size of response bodies with a known length.',
+    ['endpoint'], buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304), registry=registry)
+
+
+class PoolCollector:
+    """Reports the connection pool state of every engine of the current app as gauges, labeled by bind."""
+
+    def collect(self):
+        gauges = {
+            'checked_out': GaugeMetricFamily(
+                'fyyur_db_pool_checked_out', 'Connections currently checked out of the pool.', labels=['bind']),
+            'overflow': GaugeMetricFamily(
+                'fyyur_db_pool_overflow', 'Connections open beyond the pool size (negative while below it).',
+                labels=['bind']),
+            'size': GaugeMetricFamily('fyyur_db_pool_size', 'Configured size of the pool.', labels=['bind']),
+        }
+        if has_app_context():
+            for bind, engine in current_app.extensions['sqlalchemy'].engines.items():
+                pool = engine.pool
+                # only queue pools have a size; SQLite memory databases use a single shared connection
+                if not hasattr(pool, 'checkedout'):
+                    continue
+                label = [bind or 'primary']
+                gauges['checked_out'].add_metric(label, pool.checkedout())
+                gauges['overflow'].add_metric(label, pool.overflow())
+                gauges['size'].add_metric(label, pool.size())
+        return gauges.values()
+
+
+registry.register(PoolCollector())
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if has_request_context() and 'request_started' in g:
+        g.sql_queries += 1
+        g.sql_seconds += elapsed
+
+
+class RequestMetrics:
+    """Times every request, its SQL statements and its templates.
+
+    The totals go out in a ``Server-Timing`` header and into the Prometheus histograms served at
+    ``/metrics``. The histograms are observed at request teardown, so streamed pages are measured
+    until their last chunk. The header only covers the work done before the response started.
+    Streamed pages render while they are sent, so their template time only shows in the duration.
+    """
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._observe)
+        before_render_template.connect(self._start_template, app)
+        template_rendered.connect(self._end_template, app)
+
+    @staticmethod
+    def _start():
+        g.request_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+        g.template_seconds = 0.0
+
+    @staticmethod
+    def _finish(response):
+        if 'request_started' not in g:
+            return response
+        g.response_status = response.status_code
+        # asking a streamed response for its length would buffer the whole stream
+        g.response_size = None if response.is_streamed else response.calculate_content_length()
+        if current_app.config['SERVER_TIMING_HEADER']:
+            response.headers['Server-Timing'] = ', '.join([
+                f'app;dur={(time.perf_counter() - g.request_started) * 1000:.1f}',
+                f'db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_queries} queries"',
+                f'tpl;dur={g.template_seconds * 1000:.1f}',
+            ])
+        return response
+
+    @staticmethod
+    def _observe(error):
+        if 'request_started' not in g:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        REQUESTS.labels(endpoint, g.get('response_status', 500)).inc()
+        REQUEST_DURATION.labels(endpoint).observe(time.perf_counter() - g.request_started)
+        SQL_QUERIES.labels(endpoint).observe(g.sql_queries)
+        SQL_DURATION.labels(endpoint).observe(g.sql_seconds)
+        TEMPLATE_DURATION.labels(endpoint).observe(g.template_seconds)
+        if g.get('response_size') is not None:
+            RESPONSE_SIZE.labels(endpoint).observe(g.response_size)
+
+    @staticmethod
+    def _start_template(sender, template, context, **extra):
+        g.template_started = time.perf_counter()
+
+    @staticmethod
+    def _end_template(sender, template, context, **extra):
+        if 'request_started' in g and 'template_started' in g:
+            g.template_seconds += time.perf_counter() - g.pop('template_started')
+
+
+def metrics_response():
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,39 @@
+"""empty message
+
+Revision ID: a1c4e9f2b7d3
+Revises: 5bae14f514a7
+Create Date: 2026-10-18 10:12:41.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c4e9f2b7d3'
+down_revision = '5bae14f514a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # strings carrying an explicit offset keep it, naive ones are taken as UTC
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+    op.alter_column('Show', 'start_time',
+                    existing_type=sa.VARCHAR(length=120),
+                    type_=sa.DateTime(timezone=True),
+                    existing_nullable=False,
+                    postgresql_using='start_time::timestamp with time zone')
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.alter_column('Show', 'start_time',
+                    existing_type=sa.DateTime(timezone=True),
+                    type_=sa.VARCHAR(length=120),
+                    existing_nullable=False,
+                    postgresql_using="to_char(start_time AT TIME ZONE 'UTC', "
+                                     "'YYYY-MM-DD\"T\"HH24:MI:SS.MS\"Z\"')")
@@ -0,0 +1,33 @@
+"""empty message
+
+Revision ID: a3c5e8f19b72
+Revises: d9b4e27a6f13
+Create Date: 2026-10-18 23:41:37.209514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e8f19b72'
+down_revision = 'd9b4e27a6f13'
+branch_labels = None
+depends_on = None
+
+SINGLE_ROLL_SHOW_COUNTS = "kind = 'roll_show_counts' AND status IN ('queued', 'running')"
+
+
+def upgrade():
+    # the runs that queued a new row each time left one finished row per run, and maybe several chains
+    op.execute('''DELETE FROM "Job" WHERE kind = 'roll_show_counts' AND status = 'done' ''')
+    op.execute(f'''
+        DELETE FROM "Job" WHERE {SINGLE_ROLL_SHOW_COUNTS}
+            AND id > (SELECT min(id) FROM "Job" WHERE {SINGLE_ROLL_SHOW_COUNTS})
+    ''')
+    op.create_index('ix_Job_single_roll_show_counts', 'Job', ['kind'], unique=True,
+                    postgresql_where=sa.text(SINGLE_ROLL_SHOW_COUNTS), sqlite_where=sa.text(SINGLE_ROLL_SHOW_COUNTS))
+
+
+def downgrade():
+    op.drop_index('ix_Job_single_roll_show_counts', table_name='Job')
@@ -0,0 +1,49 @@
+"""empty message
+
+Revision ID: a8d3e61f0b95
+Revises: f2a6c81d3e47
+Create Date: 2026-10-18 19:14:52.803146
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3e61f0b95'
+down_revision = 'f2a6c81d3e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+
+    # existing shows get two hours, cut short where the next show at the venue or by the artist
+    # begins, so that earlier double bookings do not fail the constraints below. Of several shows
+    # starting at the same time, all but the last one end where they start and take no time.
+    op.execute('''
+        UPDATE "Show" SET end_time = LEAST("Show".start_time + interval '2 hours', next.venue_next, next.artist_next)
+        FROM (SELECT venue_id, artist_id, start_time,
+                     lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, artist_id) AS venue_next,
+                     lead(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, venue_id) AS artist_next
+              FROM "Show") AS next
+        WHERE ("Show".venue_id, "Show".artist_id, "Show".start_time) = (next.venue_id, next.artist_id, next.start_time)
+    ''')
+    op.alter_column('Show', 'end_time', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+    op.create_check_constraint('ck_Show_end_time', 'Show', 'end_time >= start_time')
+    op.create_check_constraint('ck_Show_max_duration', 'Show', "end_time <= start_time + interval '1 day'")
+    op.create_exclude_constraint('ex_Show_venue_id_overlap', 'Show',
+                                 ('venue_id', '='), (sa.text('tstzrange(start_time, end_time)'), '&&'), using='gist')
+    op.create_exclude_constraint('ex_Show_artist_id_overlap', 'Show',
+                                 ('artist_id', '='), (sa.text('tstzrange(start_time, end_time)'), '&&'), using='gist')
+
+
+def downgrade():
+    op.drop_constraint('ex_Show_artist_id_overlap', 'Show')
+    op.drop_constraint('ex_Show_venue_id_overlap', 'Show')
+    op.drop_constraint('ck_Show_max_duration', 'Show')
+    op.drop_constraint('ck_Show_end_time', 'Show')
+    op.drop_column('Show', 'end_time')
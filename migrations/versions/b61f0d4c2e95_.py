@@ -0,0 +1,24 @@
+"""empty message
+
+Revision ID: b61f0d4c2e95
+Revises: a3c5e8f19b72
+Create Date: 2026-10-19 09:12:46.531208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b61f0d4c2e95'
+down_revision = 'a3c5e8f19b72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Job_kind_finished_at', 'Job', ['kind', 'finished_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Job_kind_finished_at', table_name='Job')
@@ -0,0 +1,42 @@
+"""empty message
+
+Revision ID: c6f0d2b84a19
+Revises: a8d3e61f0b95
+Create Date: 2026-10-18 20:37:15.264810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f0d2b84a19'
+down_revision = 'a8d3e61f0b95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('Job',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('kind', sa.String(length=64), nullable=False),
+                    sa.Column('payload', sa.JSON(), nullable=False),
+                    sa.Column('status', sa.String(length=16), nullable=False),
+                    sa.Column('progress', sa.JSON(), nullable=True),
+                    sa.Column('result', sa.JSON(), nullable=True),
+                    sa.Column('error', sa.Text(), nullable=True),
+                    sa.Column('attempts', sa.Integer(), nullable=False),
+                    sa.Column('worker', sa.String(length=255), nullable=True),
+                    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.Column('run_after', sa.DateTime(timezone=True), nullable=False),
+                    sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+                    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+                    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index('ix_Job_status_run_after', 'Job', ['status', 'run_after'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Job_status_run_after', table_name='Job')
+    op.drop_table('Job')
@@ -0,0 +1,40 @@
+"""empty message
+
+Revision ID: d9b4e27a6f13
+Revises: c6f0d2b84a19
+Create Date: 2026-10-18 21:52:08.417630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b4e27a6f13'
+down_revision = 'c6f0d2b84a19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('counted_past', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.execute('UPDATE "Show" SET counted_past = start_time < now()')
+    op.create_index('ix_Show_uncounted_start_time', 'Show', ['start_time'], unique=False,
+                    postgresql_where=sa.text('NOT counted_past'), sqlite_where=sa.text('NOT counted_past'))
+
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.execute(f'''
+            UPDATE "{table}" SET
+                upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE {key} = "{table}".id AND NOT counted_past),
+                past_shows_count = (SELECT count(*) FROM "Show" WHERE {key} = "{table}".id AND counted_past)
+        ''')
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_index('ix_Show_uncounted_start_time', table_name='Show')
+    op.drop_column('Show', 'counted_past')
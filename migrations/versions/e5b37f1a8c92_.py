@@ -0,0 +1,98 @@
+"""empty message
+
+Revision ID: e5b37f1a8c92
+Revises: d4a09c7e5b21
+Create Date: 2026-10-18 15:31:09.245718
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b37f1a8c92'
+down_revision = 'd4a09c7e5b21'
+branch_labels = None
+depends_on = None
+
+genre = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+venue = sa.table('Venue', sa.column('id', sa.Integer), sa.column('genres', sa.String))
+artist = sa.table('Artist', sa.column('id', sa.Integer), sa.column('genres', sa.String))
+venue_genre = sa.table('VenueGenre', sa.column('venue_id', sa.Integer), sa.column('genre_id', sa.Integer))
+artist_genre = sa.table('ArtistGenre', sa.column('artist_id', sa.Integer), sa.column('genre_id', sa.Integer))
+
+
+def upgrade():
+    op.create_table('Genre',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(length=120), nullable=False),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('name')
+                    )
+    op.create_table('VenueGenre',
+                    sa.Column('venue_id', sa.Integer(), nullable=False),
+                    sa.Column('genre_id', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+                    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+                    )
+    op.create_index('ix_VenueGenre_genre_id', 'VenueGenre', ['genre_id'], unique=False)
+    op.create_table('ArtistGenre',
+                    sa.Column('artist_id', sa.Integer(), nullable=False),
+                    sa.Column('genre_id', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+                    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+                    )
+    op.create_index('ix_ArtistGenre_genre_id', 'ArtistGenre', ['genre_id'], unique=False)
+
+    # move the JSON encoded genre lists into the new tables
+    connection = op.get_bind()
+    venue_rows = [(row.id, json.loads(row.genres or '[]')) for row in connection.execute(sa.select(venue))]
+    artist_rows = [(row.id, json.loads(row.genres or '[]')) for row in connection.execute(sa.select(artist))]
+
+    names = sorted({name for _, genres in venue_rows + artist_rows for name in genres})
+    if names:
+        op.bulk_insert(genre, [{'name': name} for name in names])
+    genre_ids = {row.name: row.id for row in connection.execute(sa.select(genre))}
+
+    venue_links = [{'venue_id': venue_id, 'genre_id': genre_ids[name]}
+                   for venue_id, genres in venue_rows for name in set(genres)]
+    if venue_links:
+        op.bulk_insert(venue_genre, venue_links)
+    artist_links = [{'artist_id': artist_id, 'genre_id': genre_ids[name]}
+                    for artist_id, genres in artist_rows for name in set(genres)]
+    if artist_links:
+        op.bulk_insert(artist_genre, artist_links)
+
+    op.drop_column('Venue', 'genres')
+    op.drop_column('Artist', 'genres')
+
+
+def downgrade():
+    op.add_column('Artist', sa.Column('genres', sa.VARCHAR(length=120), nullable=True))
+    op.add_column('Venue', sa.Column('genres', sa.VARCHAR(length=120), nullable=True))
+
+    connection = op.get_bind()
+    for table, link, key in ((venue, venue_genre, 'venue_id'), (artist, artist_genre, 'artist_id')):
+        owned = {}
+        rows = connection.execute(
+            sa.select(link.c[key], genre.c.name).select_from(link.join(genre, link.c.genre_id == genre.c.id))
+        )
+        for owner_id, name in rows:
+            owned.setdefault(owner_id, []).append(name)
+        for owner_id, in connection.execute(sa.select(table.c.id)):
+            connection.execute(
+                table.update().where(table.c.id == owner_id).values(genres=json.dumps(owned.get(owner_id, [])))
+            )
+
+    op.alter_column('Venue', 'genres', existing_type=sa.VARCHAR(length=120), nullable=False)
+    op.alter_column('Artist', 'genres', existing_type=sa.VARCHAR(length=120), nullable=False)
+
+    op.drop_index('ix_ArtistGenre_genre_id', table_name='ArtistGenre')
+    op.drop_table('ArtistGenre')
+    op.drop_index('ix_VenueGenre_genre_id', table_name='VenueGenre')
+    op.drop_table('VenueGenre')
+    op.drop_table('Genre')
@@ -0,0 +1,29 @@
+"""empty message
+
+Revision ID: f2a6c81d3e47
+Revises: e5b37f1a8c92
+Create Date: 2026-10-18 18:02:41.517309
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6c81d3e47'
+down_revision = 'e5b37f1a8c92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False,
+                                       server_default=sa.func.now()))
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,75 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import abort
+from sqlalchemy import TypeDecorator, literal, tuple_
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'prev_cursor', 'next_cursor'])
+
+
+def encode_cursor(values):
+    """Encode the sort key of a row as an opaque, url safe cursor."""
+    raw = json.dumps(list(values), default=lambda value: value.isoformat())
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """The values of ``columns`` in ``cursor``, as their columns' Python types; aborts with a 400 when malformed."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError('A cursor holds one value per sort column.')
+        return [_cursor_value(value, _python_type(column.type)) for column, value in zip(columns, values)]
+    except (TypeError, ValueError):
+        abort(400)
+
+
+def _python_type(column_type):
+    if isinstance(column_type, TypeDecorator):
+        column_type = column_type.impl_instance
+    return column_type.python_type
+
+
+def _cursor_value(value, python_type):
+    if python_type is datetime:
+        if not isinstance(value, str):
+            raise TypeError('A datetime is encoded as an ISO 8601 string.')
+        return datetime.fromisoformat(value)
+    # bool is an int too, but never a valid id
+    if not isinstance(value, python_type) or (python_type is int and isinstance(value, bool)):
+        raise TypeError(f'Expected a {python_type.__name__}, got {value!r}.')
+    return value
+
+
+def paginate_keyset(query, columns, key, per_page, after=None, before=None):
+    """Return one page of ``query`` ordered by ``columns``, starting after or ending before a cursor.
+
+    ``key`` maps a result row to the values of ``columns`` for that row. The page is selected with a
+    row value comparison on ``columns`` instead of an OFFSET, so with an index on those columns every
+    page costs the same no matter how deep into the listing it is.
+    """
+    cursor = before or after
+    if cursor:
+        values = [literal(value, column.type) for column, value in zip(columns, decode_cursor(cursor, columns))]
+        if before:
+            query = query.filter(tuple_(*columns) < tuple_(*values))
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    if before:
+        rows = query.order_by(*[column.desc() for column in columns]).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        prev_cursor = encode_cursor(key(items[0])) if has_more else None
+        next_cursor = encode_cursor(key(items[-1])) if items else None
+    else:
+        rows = query.order_by(*columns).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = rows[:per_page]
+        prev_cursor = encode_cursor(key(items[0])) if after and items else None
+        next_cursor = encode_cursor(key(items[-1])) if has_more else None
+
+    return KeysetPage(items, prev_cursor, next_cursor)
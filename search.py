@@ -0,0 +1,23 @@
+from sqlalchemy import case, func
+
+
+def escape_like(term, escape='\\'):
+    """Escape the LIKE wildcards in a user supplied search term."""
+    return term.replace(escape, escape * 2).replace('%', escape + '%').replace('_', escape + '_')
+
+
+def search_query(query, column, term):
+    """Filter ``query`` to rows whose ``column`` contains ``term`` and order them by relevance.
+
+    On PostgreSQL the substring match is served by the pg_trgm GIN index on ``column`` and the
+    results are ranked by trigram similarity. Other backends (e.g. SQLite test databases) fall
+    back to ranking prefix matches first and shorter names before longer ones.
+    """
+    escaped = escape_like(term)
+    query = query.filter(column.ilike(f"%{escaped}%", escape='\\'))
+
+    if query.session.get_bind().dialect.name == 'postgresql':
+        return query.order_by(func.similarity(column, term).desc(), column)
+
+    prefix_match = case((func.lower(column).like(f"{escaped.lower()}%", escape='\\'), 0), else_=1)
+    return query.order_by(prefix_match, func.length(column), column)
@@ -0,0 +1,103 @@
+import os
+import re
+import sys
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)'
+_PLACEHOLDER_LIST = re.compile(rf'\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+class QueryGuardError(Exception):
+    """Raised in enforcing mode when a request repeats a statement too often or runs a slow one."""
+
+
+def fingerprint(statement):
+    """The statement with literals and IN lists collapsed, so calls differing only in values match."""
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _PLACEHOLDER_LIST.sub('(?)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+def origin():
+    """``file:line`` of the innermost frame of this application's own code that led to the statement."""
+    root = current_app.root_path + os.sep
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and filename != __file__ and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, current_app.root_path)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('guard_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['guard_started'].pop()
+    if has_request_context() and 'statement_counts' in g:
+        QueryGuard.check(statement, elapsed)
+
+
+class QueryGuard:
+    """Flags N+1 patterns and slow statements per request.
+
+    Statements are fingerprinted (literals and bound values stripped), and a fingerprint executed
+    more than QUERY_REPEAT_THRESHOLD times in one request is reported. So is any statement slower
+    than QUERY_SLOW_MS. Both reports name the endpoint and the line of app code that issued the
+    statement, and go to the app log. With QUERY_GUARD_RAISE they raise QueryGuardError from the
+    offending statement instead. So do repeats under app.testing, so a route regressing into an N+1
+    fails its test; slow statements are only logged there, as their timing depends on the machine.
+    """
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.teardown_request(self._report)
+
+    @staticmethod
+    def _start():
+        g.statement_counts = {}
+        g.statement_origins = {}
+
+    @staticmethod
+    def enforcing(repeat=False):
+        return current_app.config['QUERY_GUARD_RAISE'] or (repeat and current_app.testing)
+
+    @classmethod
+    def check(cls, statement, elapsed):
+        config = current_app.config
+        key = fingerprint(statement)
+        count = g.statement_counts[key] = g.statement_counts.get(key, 0) + 1
+        threshold = config['QUERY_REPEAT_THRESHOLD']
+
+        if threshold and count == threshold + 1:
+            g.statement_origins[key] = origin()
+            if cls.enforcing(repeat=True):
+                raise QueryGuardError(
+                    f'{request.endpoint} ran the same statement more than {threshold} times '
+                    f'(from {g.statement_origins[key]}): {key}')
+
+        if config['QUERY_SLOW_MS'] and elapsed * 1000 > config['QUERY_SLOW_MS']:
+            message = (f'{request.endpoint} ran a statement taking {elapsed * 1000:.0f}ms, '
+                       f'over the {config["QUERY_SLOW_MS"]}ms budget (from {origin()}): {key}')
+            if cls.enforcing():
+                raise QueryGuardError(message)
+            current_app.logger.warning(message)
+
+    @staticmethod
+    def _report(error):
+        for key, line in g.pop('statement_origins', {}).items():
+            current_app.logger.warning(
+                '%s ran the same statement %d times (from %s), a likely N+1 query: %s',
+                request.endpoint, g.statement_counts[key], line, key)
@@ -2,3 +2,27 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// as-you-type suggestions for the venue and artist search boxes
+$(function () {
+  $('input[data-autocomplete]').each(function () {
+    var input = $(this);
+    var list = $('#' + input.attr('list'));
+    var pending = null;
+    input.on('input', function () {
+      if (pending) {
+        pending.abort();
+      }
+      if (!input.val()) {
+        list.empty();
+        return;
+      }
+      pending = $.getJSON('/autocomplete', {q: input.val(), type: input.data('autocomplete')}, function (response) {
+        list.empty();
+        $.each(response.data, function (i, suggestion) {
+          list.append($('<option>').attr('value', suggestion.name));
+        });
+      });
+    });
+  });
+});
@@ -0,0 +1,99 @@
+import os
+import re
+import shutil
+import time
+
+from jinja2 import ChainableUndefined, FileSystemBytecodeCache
+
+# the directory of each code version is named after the start of the version
+_VERSION_DIRECTORY = re.compile(r'[0-9a-f]{12}')
+
+
+class _Placeholder(ChainableUndefined):
+    """Stands in for every template variable during the warm-up: its attributes, items and calls are itself."""
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+
+class TemplateCache:
+    """Keeps compiled templates on disk, and has them loaded before a worker serves its first request.
+
+    Jinja writes the bytecode of every template it compiles to TEMPLATE_CACHE_DIR, in a directory
+    per code version, so workers started later (or every worker, once `flask precompile-templates`
+    ran at build time) read bytecode instead of compiling templates. A template whose source
+    changes is compiled again. With TEMPLATE_WARMUP, ``create_app`` then loads every template and
+    renders it once, with placeholders for its variables, so the first requests a worker serves do
+    not pay for either.
+
+    The cache directory of each app, None without one, is kept in its ``extensions['template_cache']``.
+    """
+
+    def init_app(self, app):
+        app.extensions['template_cache'] = None
+        root = app.config['TEMPLATE_CACHE_DIR']
+        if root:
+            directory = os.path.join(root, app.extensions['code_version'][:12])
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                app.logger.warning('Cannot create the template cache directory %s', directory)
+            else:
+                app.extensions['template_cache'] = directory
+                app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+    @staticmethod
+    def directory(app):
+        return app.extensions['template_cache']
+
+    def precompile(self, app):
+        """Compile every template into an emptied cache directory; returns their names.
+
+        The directories of other code versions are removed; anything else in TEMPLATE_CACHE_DIR is left alone.
+        """
+        directory = self.directory(app)
+        if directory is None:
+            raise RuntimeError('There is no template cache directory; set TEMPLATE_CACHE_DIR.')
+        root = app.config['TEMPLATE_CACHE_DIR']
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if path != directory and _VERSION_DIRECTORY.fullmatch(name) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        app.jinja_env.bytecode_cache.clear()
+        if app.jinja_env.cache is not None:
+            app.jinja_env.cache.clear()
+        names = template_names(app)
+        for name in names:
+            app.jinja_env.get_template(name)
+        return names
+
+    def warm_up(self, app):
+        """Load every template, from the bytecode cache when it has it, and render each once.
+
+        Rendering runs before any traffic, so the environment can swap in placeholders for the
+        variables the views would pass. A template that still fails to render is loaded all the same.
+        """
+        started = time.perf_counter()
+        names = template_names(app)
+        failed = []
+        undefined = app.jinja_env.undefined
+        app.jinja_env.undefined = _Placeholder
+        try:
+            with app.test_request_context():
+                for name in names:
+                    template = app.jinja_env.get_template(name)
+                    context = {}
+                    app.update_template_context(context)
+                    try:
+                        template.render(context)
+                    except Exception:
+                        failed.append(name)
+        finally:
+            app.jinja_env.undefined = undefined
+        if failed:
+            app.logger.debug('Loaded, but could not render with placeholders: %s', ', '.join(failed))
+        app.logger.debug('Warmed up %d templates in %.0fms', len(names), (time.perf_counter() - started) * 1000)
+
+
+def template_names(app):
+    return app.jinja_env.list_templates(extensions=['html'])
@@ -0,0 +1,57 @@
+"""Micro-benchmark of the `datetime` Jinja filter.
+
+Compares the per-call cost of the original filter (re-parse the string and hand the pattern to
+babel.dates.format_datetime on every call) with filters.format_datetime, for both distinct and
+repeated timestamps. Run from the repository root:
+
+    python test/bench_format_datetime.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import _format_datetime, format_datetime  # noqa: E402
+
+CALLS = 20000
+
+
+def original_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en_US')
+
+
+def per_call(function, values):
+    values = iter(values)
+    seconds = timeit.timeit(lambda: function(next(values), 'full'), number=CALLS)
+    return seconds / CALLS * 1e6
+
+
+def main():
+    start = datetime(2020, 1, 1, 20, 0, tzinfo=pytz.UTC)
+    distinct = [start + timedelta(minutes=30 * i) for i in range(CALLS)]
+    repeated = [distinct[i % 100] for i in range(CALLS)]
+
+    results = [
+        ('original, string input', per_call(original_format_datetime, [value.isoformat() for value in distinct])),
+        ('cached, distinct datetimes', per_call(format_datetime, distinct)),
+    ]
+    _format_datetime.cache_clear()
+    results.append(('cached, 100 repeated datetimes', per_call(format_datetime, repeated)))
+
+    for name, microseconds in results:
+        print(f"{name:<32} {microseconds:8.2f} us/call")
+
+
+if __name__ == '__main__':
+    main()
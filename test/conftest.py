@@ -0,0 +1,62 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as fyyur  # noqa: E402
+
+PAST = datetime(2019, 5, 21, 21, 30, tzinfo=pytz.UTC)
+UPCOMING = datetime(2035, 4, 1, 20, 0, tzinfo=pytz.UTC)
+
+
+def seed():
+    """Two venues, two artists and a past and an upcoming show for each venue."""
+    jazz = fyyur.Genre.from_names(['Jazz'])
+    venues = [fyyur.Venue(id=venue_id, name=name, city=city, state=state, address='1 Main Street', phone='123',
+                          facebook_link='https://www.facebook.com/x', genres=jazz)
+              for venue_id, name, city, state in ((1, 'The Musical Hop', 'San Francisco', 'CA'),
+                                                  (2, 'The Dueling Pianos Bar', 'New York', 'NY'))]
+    artists = [fyyur.Artist(id=artist_id, name=name, city='San Francisco', state='CA', phone='123',
+                            facebook_link='https://www.facebook.com/x', genres=jazz)
+               for artist_id, name in ((3, 'Guns N Petals'), (4, 'The Wild Sax Band'))]
+    fyyur.db.session.add_all(venues + artists)
+    fyyur.db.session.flush()
+    for venue_id, artist_id, start_time in ((1, 3, PAST), (1, 4, UPCOMING), (2, 3, UPCOMING), (2, 4, PAST)):
+        fyyur.db.session.add(fyyur.Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time,
+                                        end_time=start_time + timedelta(hours=2)))
+    fyyur.db.session.commit()
+    fyyur.recount_shows()
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on its own SQLite database under ``tmp_path``, created and seeded."""
+
+    def make(name='fyyur', **config):
+        application = fyyur.create_app(dict({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / name}.db',
+            'TESTING': True,
+            'WTF_CSRF_ENABLED': False,
+            'TEMPLATE_CACHE_DIR': str(tmp_path / 'templates'),
+        }, **config))
+        with application.app_context():
+            # only the primary: a replica bind registered by another app stays on the shared db object
+            fyyur.db.create_all(bind_key=None)
+            seed()
+        return application
+
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
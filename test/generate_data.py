@@ -0,0 +1,198 @@
+"""Deterministic generator of a synthetic Fyyur dataset.
+
+Writes venues.csv, artists.csv and shows.csv to an output directory, in the format read by
+`flask import`. The same seed and anchor date always produce the same files. Listings are spread over
+real cities with a skew towards the larger ones. Genres follow a popularity curve. A few venues and
+artists get most of the shows, and by default 70% of the shows are in the past. No venue or artist
+is booked for two overlapping shows. Run from the repository root:
+
+    python test/generate_data.py --venues 2000 --artists 5000 --shows 200000 /tmp/fyyur-data
+    flask import venues /tmp/fyyur-data/venues.csv
+    flask import artists /tmp/fyyur-data/artists.csv
+    flask import shows /tmp/fyyur-data/shows.csv
+"""
+import argparse
+import csv
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+
+# state: [(city, relative size), ...]
+CITIES = {
+    'CA': [('Los Angeles', 40), ('San Francisco', 18), ('San Diego', 14), ('Oakland', 8), ('Sacramento', 6)],
+    'NY': [('New York', 60), ('Brooklyn', 25), ('Buffalo', 5), ('Rochester', 4)],
+    'TX': [('Houston', 22), ('Austin', 20), ('Dallas', 18), ('San Antonio', 14)],
+    'FL': [('Miami', 20), ('Orlando', 12), ('Tampa', 10)],
+    'IL': [('Chicago', 40), ('Evanston', 3)],
+    'TN': [('Nashville', 20), ('Memphis', 10)],
+    'WA': [('Seattle', 20), ('Spokane', 4)],
+    'GA': [('Atlanta', 18), ('Savannah', 4)],
+    'LA': [('New Orleans', 14), ('Baton Rouge', 4)],
+    'CO': [('Denver', 14), ('Boulder', 4)],
+    'MA': [('Boston', 16), ('Cambridge', 5)],
+    'OR': [('Portland', 14), ('Eugene', 3)],
+}
+
+GENRES = [
+    ('Rock n Roll', 14), ('Pop', 12), ('Hip-Hop', 10), ('Jazz', 8), ('Electronic', 8), ('Alternative', 7),
+    ('Country', 7), ('R&B', 6), ('Folk', 5), ('Blues', 5), ('Punk', 4), ('Soul', 4), ('Heavy Metal', 4),
+    ('Reggae', 3), ('Funk', 3), ('Classical', 3), ('Instrumental', 2), ('Musical Theatre', 2), ('Other', 2),
+]
+
+VENUE_WORDS = (['Blue', 'Velvet', 'Golden', 'Crooked', 'Silver', 'Red', 'Old', 'Electric', 'Copper', 'Midnight',
+                'Lucky', 'Hidden', 'Wild', 'Broken', 'Iron'],
+               ['Room', 'Lounge', 'Hall', 'Tavern', 'Ballroom', 'Cellar', 'Theatre', 'Club', 'Garden', 'Saloon',
+                'Warehouse', 'Stage', 'Bar', 'Pavilion'])
+
+ARTIST_WORDS = (['The', 'Wild', 'Black', 'Neon', 'Quiet', 'Loud', 'Paper', 'Velvet', 'Young', 'Lonely', 'Static',
+                 'Cosmic', 'Rusty', 'Sweet', 'Northern'],
+                ['Foxes', 'Horns', 'Pilots', 'Ghosts', 'Sparrows', 'Machines', 'Brothers', 'Tides', 'Saints',
+                 'Wolves', 'Echoes', 'Kings', 'Lanterns', 'Drifters', 'Sax Band'])
+
+SHOW_HOURS = [(18, 1), (19, 3), (20, 5), (21, 4), (22, 2), (23, 1)]
+# minutes
+SHOW_DURATIONS = [(60, 2), (90, 3), (120, 4), (150, 1)]
+SLOT = timedelta(minutes=30)
+
+
+class Weighted:
+    """Draws from ``choices`` with the given relative weights."""
+
+    def __init__(self, choices, weights):
+        self.choices = list(choices)
+        self.cum_weights = list(accumulate(weights))
+
+    def draw(self, rng, k=1):
+        return rng.choices(self.choices, cum_weights=self.cum_weights, k=k)
+
+    def sample(self, rng, k):
+        """``k`` distinct choices."""
+        picked = []
+        while len(picked) < k:
+            choice = self.draw(rng)[0]
+            if choice not in picked:
+                picked.append(choice)
+        return picked
+
+
+def zipf(n, exponent=1.0):
+    """Weights of ``n`` items whose popularity falls off with their rank."""
+    return [1 / rank ** exponent for rank in range(1, n + 1)]
+
+
+def locations():
+    cities = [(state, city) for state, state_cities in CITIES.items() for city, _ in state_cities]
+    sizes = [size for state_cities in CITIES.values() for _, size in state_cities]
+    return Weighted(cities, sizes)
+
+
+def unique_name(rng, words, taken):
+    name = f'{rng.choice(words[0])} {rng.choice(words[1])}'
+    candidate, suffix = name, 2
+    while candidate in taken:
+        candidate = f'{name} {suffix}'
+        suffix += 1
+    taken.add(candidate)
+    return candidate
+
+
+def listing(rng, number, kind, words, taken, places, genres):
+    state, city = places.draw(rng)[0]
+    name = unique_name(rng, words, taken)
+    slug = name.lower().replace(' ', '')
+    seeking = rng.random() < 0.3
+    return {
+        'name': name,
+        'city': city,
+        'state': state,
+        'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}',
+        'genres': ','.join(genres.sample(rng, rng.choice([1, 1, 2, 2, 3]))),
+        'facebook_link': f'https://www.facebook.com/{slug}',
+        'image_link': f'https://images.example.com/{kind}/{number}.jpg',
+        'website': f'https://www.{slug}.com' if rng.random() < 0.6 else '',
+    }, seeking
+
+
+def generate_venues(rng, count, places, genres):
+    taken = set()
+    for number in range(1, count + 1):
+        venue, seeking = listing(rng, number, 'venues', VENUE_WORDS, taken, places, genres)
+        venue['address'] = f'{rng.randint(1, 9999)} {rng.choice(["Main", "Market", "Oak", "Elm", "Pine"])} St'
+        venue['seeking_talent'] = str(seeking).lower()
+        venue['seeking_description'] = f'Booking local acts in {venue["city"]}.' if seeking else ''
+        yield venue
+
+
+def generate_artists(rng, count, places, genres):
+    taken = set()
+    for number in range(1, count + 1):
+        artist, seeking = listing(rng, number, 'artists', ARTIST_WORDS, taken, places, genres)
+        artist['seeking_venue'] = str(seeking).lower()
+        artist['seeking_description'] = f'Looking for venues around {artist["city"]}.' if seeking else ''
+        yield artist
+
+
+def generate_shows(rng, count, venue_names, artist_names, anchor, past_share):
+    # popularity is assigned in shuffled order, so the busiest venues are not simply the first ones
+    venues = Weighted(rng.sample(venue_names, len(venue_names)), zipf(len(venue_names), 0.8))
+    artists = Weighted(rng.sample(artist_names, len(artist_names)), zipf(len(artist_names), 0.8))
+    hours = Weighted(*zip(*SHOW_HOURS))
+    durations = Weighted(*zip(*SHOW_DURATIONS))
+    midnight = datetime.combine(anchor, time())
+    # the half-hour slots each venue and artist is booked for; a show needing a taken slot is drawn again
+    booked = set()
+    generated = 0
+    while generated < count:
+        days = -rng.randint(1, 730) if rng.random() < past_share else rng.randint(0, 365)
+        start_time = midnight + timedelta(days=days, hours=hours.draw(rng)[0], minutes=rng.choice([0, 30]))
+        duration = durations.draw(rng)[0]
+        venue, artist = venues.draw(rng)[0], artists.draw(rng)[0]
+        first = (start_time - midnight) // SLOT
+        slots = [(owner, slot) for owner in (('venue', venue), ('artist', artist))
+                 for slot in range(first, first + duration // 30)]
+        if any(slot in booked for slot in slots):
+            continue
+        booked.update(slots)
+        generated += 1
+        yield {'venue': venue, 'artist': artist, 'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+               'duration': duration}
+
+
+def write_csv(path, rows, fields):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('output', help='directory to write venues.csv, artists.csv and shows.csv to')
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--anchor', type=date.fromisoformat, default=date.today(),
+                        help='date (YYYY-MM-DD) that splits past from upcoming shows; today by default')
+    parser.add_argument('--past-share', type=float, default=0.7, help='fraction of the shows in the past')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    places = locations()
+    genres = Weighted(*zip(*GENRES))
+    os.makedirs(args.output, exist_ok=True)
+
+    venues = list(generate_venues(rng, args.venues, places, genres))
+    artists = list(generate_artists(rng, args.artists, places, genres))
+    shows = generate_shows(rng, args.shows, [venue['name'] for venue in venues],
+                           [artist['name'] for artist in artists], args.anchor, args.past_share)
+
+    write_csv(os.path.join(args.output, 'venues.csv'), venues, list(venues[0]))
+    write_csv(os.path.join(args.output, 'artists.csv'), artists, list(artists[0]))
+    write_csv(os.path.join(args.output, 'shows.csv'), shows, ['venue', 'artist', 'start_time', 'duration'])
+    print(f'Wrote {args.venues} venues, {args.artists} artists and {args.shows} shows to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
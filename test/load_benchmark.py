@@ -0,0 +1,191 @@
+"""Route-level load benchmark of the Fyyur app.
+
+Drives every route through in-process test clients against the configured database. The routes are
+the listings, both searches, the venue and artist pages, and the three create forms. Each route gets
+``--requests`` requests from ``--concurrency`` threads. The report gives p50/p95/p99 latency,
+throughput and SQL statements per request for each route, and its errors: responses of 400 and
+up, and submissions of the create forms that did not list their row. It is written as JSON with
+sorted keys so two runs can be diffed. Seed the database first (see test/generate_data.py), then run from the
+repository root:
+
+    python test/load_benchmark.py --requests 200 --concurrency 8 --output bench.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as fyyur  # noqa: E402
+
+_queries = threading.local()
+
+# The create forms answer 200 whether or not the row was written (e.g. a double booking); only
+# this flash message tells a write that went through
+CREATED = 'was successfully listed!'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    _queries.count = getattr(_queries, 'count', 0) + 1
+
+
+def search_term(rng, names):
+    name = rng.choice(names)
+    start = rng.randrange(max(len(name) - 3, 1))
+    return name[start:start + 3]
+
+
+def build_plan(rng, requests):
+    """Map each route name to the ``requests`` (method, path, form data) calls made against it."""
+    venues = fyyur.db.session.query(fyyur.Venue.id, fyyur.Venue.name).all()
+    artists = fyyur.db.session.query(fyyur.Artist.id, fyyur.Artist.name).all()
+    if not venues or not artists:
+        sys.exit('The database has no venues or artists; seed it first (see test/generate_data.py).')
+    venue_names = [venue.name for venue in venues]
+    artist_names = [artist.name for artist in artists]
+    run = f'{time.time():.0f}'
+
+    def calls(make):
+        return [make(number) for number in range(requests)]
+
+    def listing(number, kind):
+        return {
+            'name': f'Load Test {kind} {run}-{number}',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'address': '1 Load Test Way',
+            'phone': '555-555-5555',
+            'genres': rng.choice(['Jazz', 'Pop', 'Rock n Roll']),
+            'facebook_link': 'https://www.facebook.com/loadtest',
+        }
+
+    return {
+        'venues': calls(lambda number: ('GET', '/venues', None)),
+        'artists': calls(lambda number: ('GET', '/artists', None)),
+        'shows': calls(lambda number: ('GET', '/shows', None)),
+        'search_venues': calls(lambda number: (
+            'POST', '/venues/search', {'search_term': search_term(rng, venue_names)})),
+        'search_artists': calls(lambda number: (
+            'POST', '/artists/search', {'search_term': search_term(rng, artist_names)})),
+        'show_venue': calls(lambda number: ('GET', f'/venues/{rng.choice(venues).id}', None)),
+        'show_artist': calls(lambda number: ('GET', f'/artists/{rng.choice(artists).id}', None)),
+        'create_venue': calls(lambda number: ('POST', '/venues/create', listing(number, 'Venue'))),
+        'create_artist': calls(lambda number: ('POST', '/artists/create', listing(number, 'Artist'))),
+        'create_show': calls(lambda number: ('POST', '/shows/create', {
+            'venue_id': rng.choice(venues).id,
+            'artist_id': rng.choice(artists).id,
+            'start_time': (datetime.now() + timedelta(days=rng.randint(1, 365), seconds=number)
+                           ).strftime('%Y-%m-%d %H:%M:%S'),
+        })),
+    }
+
+
+def run_route(app, calls, concurrency):
+    """Make ``calls`` with ``concurrency`` threads, each with its own client; return (samples, seconds).
+
+    A sample is the latency, the number of statements and whether the request failed.
+    """
+    local = threading.local()
+
+    def call(spec):
+        method, path, data = spec
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        _queries.count = 0
+        started = time.perf_counter()
+        try:
+            response = client.open(path, method=method, data=data)
+            body = response.get_data(as_text=True)
+            failed = response.status_code >= 400 or (path.endswith('/create') and CREATED not in body)
+        except Exception:
+            # in debug mode the test client re-raises view errors instead of answering 500
+            failed = True
+        return time.perf_counter() - started, _queries.count, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(call, calls))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, seconds):
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample[2]),
+        'p50_ms': round(cuts[49], 2),
+        'p95_ms': round(cuts[94], 2),
+        'p99_ms': round(cuts[98], 2),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'throughput_rps': round(len(samples) / seconds, 1),
+        'queries_per_request': round(statistics.fmean(sample[1] for sample in samples), 2),
+        'max_queries': max(sample[1] for sample in samples),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads per route')
+    parser.add_argument('--routes', help='comma separated subset of routes to run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench.json')
+    args = parser.parse_args()
+
+    app = fyyur.create_app()
+    rng = random.Random(args.seed)
+    with app.app_context():
+        plan = build_plan(rng, args.requests)
+        dataset = {
+            'venues': fyyur.Venue.query.count(),
+            'artists': fyyur.Artist.query.count(),
+            'shows': fyyur.Show.query.count(),
+        }
+    if args.routes:
+        plan = {route: plan[route] for route in args.routes.split(',')}
+
+    routes = {}
+    for route, calls in plan.items():
+        routes[route] = summarize(*run_route(app, calls, args.concurrency))
+        print(f"{route:<16} p50 {routes[route]['p50_ms']:8.2f} ms  p99 {routes[route]['p99_ms']:8.2f} ms  "
+              f"{routes[route]['throughput_rps']:8.1f} req/s  {routes[route]['queries_per_request']:5.2f} queries")
+
+    report = {
+        'revision': git_revision(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'dataset': dataset,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'routes': routes,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+        file.write('\n')
+    print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
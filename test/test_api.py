@@ -0,0 +1,23 @@
+import pytest
+
+
+@pytest.mark.parametrize('url, status', [
+    ('/api/v1/venues/999?fields=id', 404),
+    ('/api/v1/jobs/999?fields=id', 404),
+    ('/api/v1/venues/availability?fields=id', 400),
+    ('/api/v1/autocomplete?type=bad&q=the&fields=id', 400),
+])
+def test_fields_leave_error_bodies_alone(client, url, status):
+    response = client.get(url)
+    assert response.status_code == status
+    assert 'error' in response.get_json()
+
+
+def test_fields_trim_the_data(client):
+    response = client.get('/api/v1/venues/1?fields=id,name')
+    assert response.status_code == 200
+    assert response.get_json()['data'] == {'id': 1, 'name': 'The Musical Hop'}
+
+    response = client.get('/api/v1/artists?fields=id')
+    assert response.status_code == 200
+    assert response.get_json()['data'] == [{'id': 3}, {'id': 4}]
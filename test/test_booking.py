@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as fyyur
+from booking import MAX_DURATION, free_slots
+from conftest import UPCOMING
+from importer import ShowImporter
+
+# venue 1 has artist 4 booked, and venue 2 artist 3, from UPCOMING for two hours
+LATER = UPCOMING + timedelta(days=30)
+
+
+def book(client, venue_id, artist_id, start_time, minutes=120):
+    """Submit the new show form; returns the flashed message."""
+    response = client.post('/shows/create', data={
+        'venue_id': venue_id, 'artist_id': artist_id, 'duration': minutes,
+        'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')})
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    return next(message for message in ('successfully listed', 'the venue already has a show',
+                                        'the artist already has a show') if message in text)
+
+
+def show_count(app):
+    with app.app_context():
+        return fyyur.Show.query.count()
+
+
+@pytest.mark.parametrize('start_time', [UPCOMING - timedelta(hours=2), UPCOMING + timedelta(hours=2)],
+                         ids=['ending at the start', 'starting at the end'])
+def test_back_to_back_shows_do_not_clash(app, client, start_time):
+    # artist 3 is booked at venue 2 at the same time as artist 4 at venue 1
+    assert book(client, 1, 3, start_time) == 'successfully listed'
+    assert show_count(app) == 5
+
+
+@pytest.mark.parametrize('start_time', [UPCOMING, UPCOMING + timedelta(hours=1), UPCOMING - timedelta(hours=1)])
+def test_overlapping_show_is_rejected(app, client, start_time):
+    assert book(client, 1, 3, start_time) == 'the venue already has a show'
+    assert show_count(app) == 4
+
+
+def test_overlapping_show_of_the_artist_is_rejected(app, client):
+    assert book(client, 1, 4, LATER) == 'successfully listed'
+    assert book(client, 2, 4, LATER + timedelta(minutes=30)) == 'the artist already has a show'
+    assert show_count(app) == 5
+
+
+def test_long_shows_reach_into_later_bookings(app, client):
+    minutes = MAX_DURATION // timedelta(minutes=1)
+    assert book(client, 1, 4, LATER, minutes) == 'successfully listed'
+    assert book(client, 1, 3, LATER + MAX_DURATION - timedelta(minutes=1)) == 'the venue already has a show'
+    assert book(client, 1, 3, LATER + MAX_DURATION) == 'successfully listed'
+    assert show_count(app) == 6
+
+
+def import_shows(app, rows):
+    rejected = []
+    with app.app_context(), fyyur.db.engine.connect() as connection:
+        importer = ShowImporter(connection, fyyur.db.metadata.tables, batch_size=10,
+                                on_reject=lambda number, row, errors: rejected.append((number, errors)))
+        importer.run(rows)
+    return importer.loaded, rejected
+
+
+def show_row(venue_id, artist_id, start_time, minutes=120):
+    return {'venue_id': str(venue_id), 'artist_id': str(artist_id), 'duration': str(minutes),
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def test_import_rejects_shows_clashing_within_the_batch(app):
+    loaded, rejected = import_shows(app, [
+        show_row(1, 3, LATER),
+        show_row(1, 4, LATER + timedelta(hours=1)),
+        show_row(2, 3, LATER + timedelta(minutes=90)),
+        show_row(2, 4, LATER + timedelta(hours=2)),
+    ])
+    assert loaded == 2
+    assert rejected == [(2, {'venue_id': ['The venue already has a show at that time.']}),
+                        (3, {'artist_id': ['The artist already has a show at that time.']})]
+    assert show_count(app) == 6
+
+
+def test_import_checks_long_shows_and_booked_shows(app):
+    minutes = MAX_DURATION // timedelta(minutes=1)
+    loaded, rejected = import_shows(app, [
+        show_row(1, 3, UPCOMING + timedelta(hours=1)),
+        show_row(1, 4, LATER, minutes),
+        show_row(1, 3, LATER + MAX_DURATION - timedelta(minutes=1)),
+        show_row(1, 3, LATER + MAX_DURATION),
+    ])
+    assert loaded == 2
+    assert [number for number, errors in rejected] == [1, 3]
+
+
+def at(hours):
+    return UPCOMING + timedelta(hours=hours)
+
+
+@pytest.mark.parametrize('bookings, expected', [
+    ([], [(0, 6)]),
+    ([(-1, 1)], [(1, 6)]),
+    ([(1, 2), (2, 3)], [(0, 1), (3, 6)]),
+    ([(1, 3), (2, 4)], [(0, 1), (4, 6)]),
+    ([(1, 5), (2, 3)], [(0, 1), (5, 6)]),
+    ([(5, 8)], [(0, 5)]),
+    ([(-2, 7)], []),
+])
+def test_free_slots(bookings, expected):
+    bookings = [(at(start), at(end)) for start, end in bookings]
+    assert free_slots(bookings, at(0), at(6)) == [(at(start), at(end)) for start, end in expected]
+
+
+def test_free_slots_leave_out_gaps_shorter_than_min_length():
+    bookings = [(at(1), at(2)), (at(2.5), at(4))]
+    assert free_slots(bookings, at(0), at(6), timedelta(hours=1)) == [(at(0), at(1)), (at(4), at(6))]
+    assert free_slots(bookings, at(0), at(6), timedelta(hours=2)) == [(at(4), at(6))]
+    assert free_slots(bookings, at(0), at(6), timedelta(hours=3)) == []
+
+
+def availability(client, url, start, end, **params):
+    response = client.get(url, query_string=dict(params, start=at(start).isoformat(), end=at(end).isoformat()))
+    assert response.status_code == 200
+    return {venue['venue_id']: [(datetime.fromisoformat(slot['start']), datetime.fromisoformat(slot['end']))
+                                for slot in venue['free_slots']]
+            for venue in response.get_json()['data']}
+
+
+def test_venue_availability(app, client):
+    # venue 1 is booked from 0 to 2
+    url = '/api/v1/venues/1/availability'
+    assert availability(client, url, -1, 4, duration=30) == {1: [(at(-1), at(0)), (at(2), at(4))]}
+    assert availability(client, url, 1, 4, duration=30) == {1: [(at(2), at(4))]}
+    assert availability(client, url, -1, 4, duration=90) == {1: [(at(2), at(4))]}
+    assert availability(client, url, 0.5, 1.5) == {1: []}
+
+
+def test_venue_availability_merges_overlapping_and_adjacent_bookings(app, client):
+    with app.app_context():
+        # written directly: the show form refuses overlapping shows
+        fyyur.db.session.add_all([fyyur.Show(venue_id=1, artist_id=3, start_time=at(start), end_time=at(end))
+                                  for start, end in ((1, 3), (3, 4), (6, 7))])
+        fyyur.db.session.commit()
+    assert availability(client, '/api/v1/venues/1/availability', -1, 8, duration=60) == {
+        1: [(at(-1), at(0)), (at(4), at(6)), (at(7), at(8))]}
+
+
+def test_availability_of_the_venues_in_a_state(client):
+    assert availability(client, '/api/v1/venues/availability', -1, 4, duration=30, state='NY') == {
+        2: [(at(-1), at(0)), (at(2), at(4))]}
+    assert availability(client, '/api/v1/venues/availability', -1, 4, state='CA', city='Nowhere') == {}
+
+
+@pytest.mark.parametrize('url, status', [
+    ('/api/v1/venues/999/availability?start=2035-04-01&end=2035-04-02', 404),
+    ('/api/v1/venues/1/availability?start=2035-04-02&end=2035-04-01', 400),
+    ('/api/v1/venues/1/availability?start=2035-04-01&end=2036-04-01', 400),
+    ('/api/v1/venues/availability?start=2035-04-01&end=2035-04-02', 400),
+])
+def test_availability_rejects_bad_requests(client, url, status):
+    assert client.get(url).status_code == status
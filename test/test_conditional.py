@@ -0,0 +1,30 @@
+import os
+
+import app as fyyur
+from conditional import code_version
+
+
+def test_code_version_ignores_file_times(app):
+    path = os.path.join(app.root_path, app.template_folder, 'pages', 'home.html')
+    stat = os.stat(path)
+    version = code_version(app)
+    try:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert code_version(app) == version
+    finally:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert app.extensions['code_version'] == version
+
+
+def test_listing_etags_change_when_a_venue_is_deleted(app, client):
+    etags = {url: client.get(url).get_etag()[0] for url in ('/venues', '/shows', '/artists')}
+    assert client.get('/venues', headers={'If-None-Match': f'"{etags["/venues"]}"'}).status_code == 304
+
+    client.delete('/venues/1', headers={'Accept': 'application/json'})
+    with app.app_context():
+        fyyur.jobs.work(burst=True)
+
+    for url in ('/venues', '/shows'):
+        response = client.get(url, headers={'If-None-Match': f'"{etags[url]}"'})
+        assert response.status_code == 200
+        assert client.get(url, headers={'If-None-Match': f'"{response.get_etag()[0]}"'}).status_code == 304
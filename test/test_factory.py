@@ -0,0 +1,84 @@
+from conftest import fyyur
+
+
+def rename_venue(app, venue_id, name):
+    with app.app_context():
+        fyyur.db.session.get(fyyur.Venue, venue_id).name = name
+        fyyur.db.session.commit()
+
+
+def test_apps_read_their_own_database(make_app):
+    first, second = make_app('first'), make_app('second')
+    rename_venue(second, 1, 'The Second Hop')
+    assert b'The Musical Hop' in first.test_client().get('/venues/1').data
+    assert b'The Second Hop' in second.test_client().get('/venues/1').data
+
+
+def test_apps_keep_their_own_page_cache(make_app):
+    first, second = make_app('first'), make_app('second')
+    rename_venue(second, 1, 'The Second Hop')
+    first.test_client().get('/venues/1')
+    response = second.test_client().get('/venues/1')
+    assert b'The Second Hop' in response.data and b'The Musical Hop' not in response.data
+    assert first.test_client().get('/cache/stats').get_json()['entries'] == 1
+    assert second.test_client().get('/cache/stats').get_json()['hits'] == 0
+
+
+def test_apps_keep_their_own_fragment_cache(make_app):
+    first, second = make_app('first'), make_app('second')
+    first.test_client().get('/shows')
+    assert first.test_client().get('/cache/stats').get_json()['fragments']['entries'] > 0
+    assert second.test_client().get('/cache/stats').get_json()['fragments'] == {'hits': 0, 'misses': 0, 'entries': 0}
+
+
+def test_apps_keep_their_own_typeahead_indexes(make_app):
+    first, second = make_app('first'), make_app('second')
+    rename_venue(second, 1, 'The Second Hop')
+    names = {app: [item['name'] for item in app.test_client().get('/autocomplete?type=venue&q=the').get_json()['data']]
+             for app in (first, second)}
+    assert 'The Musical Hop' in names[first] and 'The Second Hop' not in names[first]
+    assert 'The Second Hop' in names[second] and 'The Musical Hop' not in names[second]
+
+
+def test_apps_keep_their_own_settings(make_app):
+    cached, uncached = make_app('cached'), make_app('uncached', RESPONSE_CACHE_SIZE=0, COMPRESS_MIN_SIZE=10 ** 9)
+    for app in (cached, uncached):
+        app.test_client().get('/venues/1')
+    assert cached.test_client().get('/cache/stats').get_json()['entries'] == 1
+    assert uncached.test_client().get('/cache/stats').get_json()['entries'] == 0
+    headers = {'Accept-Encoding': 'gzip'}
+    assert cached.test_client().get('/venues', headers=headers).headers.get('Content-Encoding') == 'gzip'
+    assert uncached.test_client().get('/venues', headers=headers).headers.get('Content-Encoding') is None
+
+
+def venue_name(response):
+    return next(name for name in ('The Replica Hop', 'The Primary Hop') if name.encode() in response.data)
+
+
+def test_reads_go_to_the_replica_until_the_client_writes(make_app, tmp_path):
+    replica = make_app('replica')
+    rename_venue(replica, 1, 'The Replica Hop')
+    primary = make_app('primary', DB_REPLICA_URLS=[f'sqlite:///{tmp_path / "replica"}.db'])
+    writer, reader = primary.test_client(), primary.test_client()
+
+    assert venue_name(writer.get('/venues/1')) == 'The Replica Hop'
+    assert b'The Replica Hop' in writer.get('/venues').data
+
+    response = writer.post('/venues/1/edit', data={
+        'name': 'The Primary Hop', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main Street',
+        'phone': '123', 'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/x'})
+    assert response.status_code == 302
+    with primary.app_context():
+        assert fyyur.db.session.get(fyyur.Venue, 1).name == 'The Primary Hop'
+    with replica.app_context():
+        assert fyyur.db.session.get(fyyur.Venue, 1).name == 'The Replica Hop'
+
+    # the writer reads its own write from the primary for DB_REPLICA_LAG seconds
+    assert venue_name(writer.get('/venues/1')) == 'The Primary Hop'
+    # another client still reads the replica, and the page it gets is held out of the cache
+    assert venue_name(reader.get('/venues/1')) == 'The Replica Hop'
+    assert venue_name(writer.get('/venues/1')) == 'The Primary Hop'
+
+    with writer.session_transaction() as session:
+        session['db_primary_until'] = 0
+    assert b'The Replica Hop' in writer.get('/venues').data
@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import app as fyyur
+
+
+def suggested_venues(client, prefix):
+    response = client.get(f'/api/v1/autocomplete?type=venue&q={prefix}')
+    return [item['id'] for item in response.get_json()['data']]
+
+
+def test_deleted_venue_leaves_the_caches_once_the_job_ran(app, client):
+    assert client.get('/venues/1').status_code == 200
+    assert client.get('/artists/3').status_code == 200
+    assert 1 in suggested_venues(client, 'the')
+
+    response = client.delete('/venues/1', headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    # nothing is deleted yet, so nothing leaves the caches
+    assert client.get('/venues/1').status_code == 200
+    assert 1 in suggested_venues(client, 'the')
+
+    with app.app_context():
+        assert fyyur.jobs.work(burst=True) >= 1
+    assert client.get(response.get_json()['status_url']).get_json()['data']['status'] == 'done'
+    assert client.get('/venues/1').status_code == 404
+    assert 'The Musical Hop' not in client.get('/artists/3').get_data(as_text=True)
+    assert 1 not in suggested_venues(client, 'the')
+
+
+def test_roll_show_counts_reschedules_its_own_row(app):
+    with app.app_context():
+        fyyur.jobs.enqueue('roll_show_counts')
+        fyyur.db.session.commit()
+        for _ in range(3):
+            assert fyyur.jobs.work(burst=True) == 1
+            job = fyyur.Job.query.filter_by(kind='roll_show_counts').one()
+            assert job.status == 'queued' and job.run_after > fyyur.utcnow()
+            job.run_after = fyyur.utcnow()
+            fyyur.db.session.commit()
+
+        with pytest.raises(IntegrityError):
+            fyyur.jobs.enqueue('roll_show_counts')
+
+
+@pytest.mark.parametrize('url', ['/venues/abc', '/venues/999'])
+def test_deleting_a_missing_venue_queues_no_job(app, client, url):
+    assert client.delete(url, headers={'Accept': 'application/json'}).status_code == 404
+    assert client.delete(url).status_code == 404
+    with app.app_context():
+        assert not fyyur.jobs.pending('delete_venue')
@@ -0,0 +1,31 @@
+import base64
+import json
+
+import pytest
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('url', ['/artists', '/venues', '/shows', '/api/v1/artists', '/api/v1/shows'])
+@pytest.mark.parametrize('cursor', ['NQ', '!!!', raw_cursor(['x']), raw_cursor([1, 2, 3, 4]), raw_cursor({'id': 1}),
+                                    raw_cursor([True, 'x', None]), raw_cursor(['2035-04-01', 'x', 'y'])])
+def test_malformed_cursor_is_a_bad_request(client, url, cursor):
+    assert client.get(url, query_string={'after': cursor}).status_code == 400
+    assert client.get(url, query_string={'before': cursor}).status_code == 400
+
+
+@pytest.mark.parametrize('url, key', [('/api/v1/artists', 'id'), ('/api/v1/venues', 'id'),
+                                      ('/api/v1/shows', 'start_time')])
+def test_cursors_page_through_a_listing(app, client, url, key):
+    everything = [item[key] for item in client.get(url).get_json()['data']]
+    app.config['LISTING_RESULTS_PER_PAGE'] = 1
+    page = client.get(url).get_json()
+    seen = [item[key] for item in page['data']]
+    while page['next_cursor']:
+        page = client.get(url, query_string={'after': page['next_cursor']}).get_json()
+        seen += [item[key] for item in page['data']]
+    assert seen == everything and len(seen) > 1
+    previous = client.get(url, query_string={'before': page['prev_cursor']}).get_json()
+    assert [item[key] for item in previous['data']] == seen[-2:-1]
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+import pytest
+from flask import g
+
+from conftest import UPCOMING, fyyur
+
+# Statements each route runs on a cold page cache; they must not grow with the number of shows
+QUERY_COUNTS = {
+    '/shows': 2,
+    '/shows?stream=1': 2,
+    '/api/v1/shows': 2,
+    '/venues': 2,
+    '/artists': 2,
+    '/venues/1': 3,
+    '/artists/3': 3,
+    '/api/v1/venues/1': 3,
+    '/api/v1/artists/3': 3,
+}
+
+
+def statements(client, url):
+    with client:
+        response = client.get(url)
+        response.get_data()
+        assert response.status_code == 200
+        return sum(g.statement_counts.values())
+
+
+def add_shows(count):
+    for number in range(count):
+        start_time = UPCOMING + timedelta(days=number + 1)
+        for venue_id, artist_id in ((1, 3), (2, 4)):
+            fyyur.db.session.add(fyyur.Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time,
+                                            end_time=start_time + timedelta(hours=1)))
+    fyyur.db.session.commit()
+
+
+@pytest.mark.parametrize('extra_shows', [0, 40])
+@pytest.mark.parametrize('url, expected', QUERY_COUNTS.items())
+def test_query_count(app, client, url, expected, extra_shows):
+    with app.app_context():
+        add_shows(extra_shows)
+    assert statements(client, url) == expected
+
+
+@pytest.mark.parametrize('url', ['/venues/1', '/artists/3'])
+def test_cached_detail_page_runs_no_query(client, url):
+    statements(client, url)
+    assert statements(client, url) == 0
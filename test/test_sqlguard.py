@@ -0,0 +1,61 @@
+import logging
+
+import pytest
+
+import app as fyyur
+from sqlguard import QueryGuard, QueryGuardError, fingerprint
+
+
+@pytest.mark.parametrize('statement, expected', [
+    ("SELECT * FROM \"Venue\" WHERE id = 12 AND name = 'It''s'", 'SELECT * FROM "Venue" WHERE id = ? AND name = ?'),
+    ('SELECT * FROM "Venue" WHERE id IN (?, ?, ?)', 'SELECT * FROM "Venue" WHERE id IN (?)'),
+    ('SELECT * FROM "Venue" WHERE id IN (%(id_1)s, %(id_2)s)', 'SELECT * FROM "Venue" WHERE id IN (?)'),
+    ('SELECT *\n  FROM "Venue"\n WHERE id = ?', 'SELECT * FROM "Venue" WHERE id = ?'),
+])
+def test_fingerprint_strips_values(statement, expected):
+    assert fingerprint(statement) == expected
+
+
+def test_fingerprint_keeps_identifiers_with_digits():
+    assert fingerprint('SELECT venue_1.id FROM "Venue" AS venue_1') == 'SELECT venue_1.id FROM "Venue" AS venue_1'
+
+
+def add_venue_loop(app):
+    @app.route('/test/venues/<int:count>')
+    def venue_loop(count):
+        for venue_id in range(count):
+            fyyur.db.session.get(fyyur.Venue, venue_id + 100)
+        return 'ok'
+
+
+def test_repeats_up_to_the_threshold_pass(app, client):
+    add_venue_loop(app)
+    assert client.get(f'/test/venues/{app.config["QUERY_REPEAT_THRESHOLD"]}').status_code == 200
+
+
+def test_an_n_plus_one_loop_fails_the_request_when_testing(app, client):
+    add_venue_loop(app)
+    with pytest.raises(QueryGuardError, match='venue_loop ran the same statement'):
+        client.get(f'/test/venues/{app.config["QUERY_REPEAT_THRESHOLD"] + 1}')
+
+
+def test_an_n_plus_one_loop_is_logged_outside_enforcing_mode(make_app, caplog):
+    app = make_app(TESTING=False)
+    add_venue_loop(app)
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        assert app.test_client().get(f'/test/venues/{app.config["QUERY_REPEAT_THRESHOLD"] + 1}').status_code == 200
+    assert 'a likely N+1 query' in caplog.text
+
+
+def test_slow_statements_are_only_logged_when_testing(app, caplog):
+    with app.test_request_context(), caplog.at_level(logging.WARNING, logger=app.logger.name):
+        QueryGuard._start()
+        QueryGuard.check('SELECT 1', elapsed=10.0)
+    assert 'over the 250ms budget' in caplog.text
+
+
+def test_slow_statements_fail_the_request_with_query_guard_raise(make_app):
+    app = make_app(QUERY_GUARD_RAISE=True)
+    with app.test_request_context(), pytest.raises(QueryGuardError, match='over the 250ms budget'):
+        QueryGuard._start()
+        QueryGuard.check('SELECT 1', elapsed=10.0)
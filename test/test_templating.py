@@ -0,0 +1,19 @@
+import os
+
+import app as fyyur
+
+
+def test_precompile_only_removes_other_code_versions(app, tmp_path):
+    root = app.config['TEMPLATE_CACHE_DIR']
+    stale = os.path.join(root, '0123456789ab')
+    foreign = os.path.join(root, 'unrelated')
+    for path in (stale, foreign):
+        os.makedirs(path)
+        open(os.path.join(path, 'data'), 'w').close()
+
+    names = fyyur.template_cache.precompile(app)
+
+    assert 'pages/home.html' in names
+    assert not os.path.exists(stale)
+    assert os.path.exists(os.path.join(foreign, 'data'))
+    assert os.listdir(fyyur.template_cache.directory(app))
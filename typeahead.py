@@ -0,0 +1,186 @@
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from flask import current_app
+
+
+def normalize(name):
+    """Fold case, strip accents and collapse whitespace, so that "Café  Olé" and "cafe ole" match."""
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+class PrefixIndex:
+    """Names of one kind (venues, or artists) in sorted arrays, looked up by prefix with a binary search.
+
+    A name is found by its start and, ranked after those matches, by the start of any later word in
+    it, so "sax" suggests "The Wild Sax Band".
+    """
+
+    def __init__(self, entries=()):
+        self.names = {}
+        self.starts = []
+        self.words = []
+        for entry_id, name in entries:
+            if name:
+                self.names[entry_id] = name
+                for array, term in self._terms(name):
+                    array.append((term, entry_id))
+        self.starts.sort()
+        self.words.sort()
+
+    def add(self, entry_id, name):
+        """Add or rename the entry ``entry_id``."""
+        self.remove(entry_id)
+        if not name:
+            return
+        self.names[entry_id] = name
+        for array, term in self._terms(name):
+            insort(array, (term, entry_id))
+
+    def remove(self, entry_id):
+        name = self.names.pop(entry_id, None)
+        if name is None:
+            return
+        for array, term in self._terms(name):
+            del array[bisect_left(array, (term, entry_id))]
+
+    def search(self, prefix, limit):
+        """Up to ``limit`` (rank, term, id, name) matches of the normalized ``prefix``, best first."""
+        matches = []
+        seen = set()
+        for rank, array in enumerate((self.starts, self.words)):
+            position = bisect_left(array, (prefix,))
+            while position < len(array) and len(matches) < limit:
+                term, entry_id = array[position]
+                if not term.startswith(prefix):
+                    break
+                if entry_id not in seen:
+                    seen.add(entry_id)
+                    matches.append((rank, term, entry_id, self.names[entry_id]))
+                position += 1
+        return matches
+
+    def _terms(self, name):
+        words = normalize(name).split(' ')
+        yield self.starts, ' '.join(words)
+        for position in range(1, len(words)):
+            yield self.words, ' '.join(words[position:])
+
+
+class Typeahead:
+    """In-process prefix indexes of venue and artist names, serving as-you-type suggestions without a query.
+
+    A worker starts reading the indexes from the database in a background thread with its first
+    request. The routes that create, rename or delete venues and artists then update them in place.
+    Writes made by other processes (other web workers, `flask worker`, `flask import`) show up once
+    the indexes are older than TYPEAHEAD_REFRESH seconds and get rebuilt, again in the background.
+    Suggestions keep coming from the old indexes meanwhile, and changes made during a rebuild are
+    replayed onto the new ones.
+
+    The loaders registered with ``source`` are shared; every app keeps its own ``NameIndexes`` in
+    ``app.extensions``, which the methods below act on through ``current_app``.
+    """
+
+    def __init__(self):
+        self.sources = {}
+
+    def init_app(self, app):
+        app.extensions['typeahead'] = NameIndexes(self.sources, app.config['TYPEAHEAD_REFRESH'])
+        app.before_request(self._start)
+
+    def source(self, kind):
+        """Register the decorated function as the loader of ``kind``; it returns (id, name) pairs."""
+
+        def decorator(function):
+            self.sources[kind] = function
+            return function
+
+        return decorator
+
+    @staticmethod
+    def indexes():
+        return current_app.extensions['typeahead']
+
+    def add(self, kind, entry_id, name):
+        """Add or rename an entry; call it once the change is committed."""
+        self.indexes().change(kind, entry_id, name)
+
+    def remove(self, kind, entry_id):
+        self.indexes().change(kind, entry_id, None)
+
+    def suggest(self, prefix, kinds, limit):
+        """Up to ``limit`` (kind, id, name) entries of ``kinds`` matching ``prefix``; None if loading failed.
+
+        Waits for the first load of the indexes; never waits for a refresh.
+        """
+        return self.indexes().suggest(prefix, kinds, limit)
+
+    def _start(self):
+        self.indexes().start()
+
+
+class NameIndexes:
+    """The ``PrefixIndex`` of every kind of one app, and the loading and refreshing of them."""
+
+    def __init__(self, sources, refresh=None):
+        self.sources = sources
+        self.refresh = refresh
+        self.indexes = None
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._journal = None
+
+    def suggest(self, prefix, kinds, limit):
+        self._loaded.wait()
+        prefix = normalize(prefix)
+        with self._lock:
+            if self.indexes is None:
+                return None
+            if self.refresh and time.monotonic() - self.loaded_at > self.refresh:
+                self._rebuild(current_app._get_current_object())
+            if not prefix:
+                return []
+            matches = [(match, kind) for kind in kinds for match in self.indexes[kind].search(prefix, limit)]
+        matches.sort(key=lambda item: item[0][:2])
+        return [(kind, entry_id, name) for (rank, term, entry_id, name), kind in matches[:limit]]
+
+    def start(self):
+        if self.indexes is None and self._journal is None:
+            with self._lock:
+                if self.indexes is None and self._journal is None:
+                    self._rebuild(current_app._get_current_object())
+
+    def change(self, kind, entry_id, name):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((kind, entry_id, name))
+            if self.indexes is not None:
+                self.indexes[kind].add(entry_id, name)
+
+    def _rebuild(self, app):
+        # called with the lock held; at most one rebuild runs at a time
+        if self._journal is not None:
+            return
+        self._journal = []
+        threading.Thread(target=self._load, args=(app,), name='typeahead-load', daemon=True).start()
+
+    def _load(self, app):
+        indexes = None
+        try:
+            with app.app_context():
+                indexes = {kind: PrefixIndex(source()) for kind, source in self.sources.items()}
+        except Exception:
+            app.logger.exception('Loading the typeahead indexes failed')
+        with self._lock:
+            if indexes is not None:
+                for kind, entry_id, name in self._journal:
+                    indexes[kind].add(entry_id, name)
+                self.indexes = indexes
+            # a failed refresh keeps the old indexes, and tries again at the next refresh
+            self.loaded_at = time.monotonic()
+            self._journal = None
+        self._loaded.set()